@@ -0,0 +1,378 @@
+"""
+Benchmarks for patterns/other/graph_search.py.
+
+Run with the package installed (``pip install -e .``), e.g.:
+
+    python benchmarks/bench_graph_search.py bidirectional --sizes 100000 1000000
+    python benchmarks/bench_graph_search.py weighted --sizes 2500 10000
+    python benchmarks/bench_graph_search.py pruning --sizes 4 6 8
+
+The scaling suite times every find_* method on reproducible synthetic
+graphs, records peak memory with tracemalloc and saves the results as
+JSON; compare then flags regressions between two such files:
+
+    python benchmarks/bench_graph_search.py suite --output before.json
+    python benchmarks/bench_graph_search.py suite --output after.json
+    python benchmarks/bench_graph_search.py compare before.json after.json --threshold 0.1
+"""
+
+import argparse
+import datetime
+import json
+import math
+import multiprocessing
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from patterns.other.graph_search import GraphSearch
+
+
+def random_graph(n, degree, seed=0):
+    """Directed graph on 0..n-1 where every node has `degree` random successors."""
+    rng = random.Random(seed)
+    return {node: [rng.randrange(n) for _ in range(degree)] for node in range(n)}
+
+
+def scale_free_graph(n, degree=2, seed=0):
+    """Preferential attachment: each new node links both ways to `degree`
+    earlier nodes picked in proportion to their current degree."""
+    rng = random.Random(seed)
+    graph = {node: [] for node in range(n)}
+    # every node appears here once per edge end, which weights the draw
+    ends = list(range(min(n, degree + 1)))
+    for node in range(len(ends), n):
+        for other in {rng.choice(ends) for _ in range(degree)}:
+            graph[node].append(other)
+            graph[other].append(node)
+            ends += (node, other)
+    return graph
+
+
+def chain_graph(n, seed=0):
+    """0 -> 1 -> ... -> n-1."""
+    return {node: [node + 1] for node in range(n - 1)}
+
+
+def sink_heavy_graph(layers, width=3, sinks=4, sink_depth=6, seed=0):
+    """Layered DAG from "s" to "t" whose nodes also lead into dead-end
+    branches: each node gets `sinks` chains of `sink_depth` nodes that
+    fan into each other but never reach "t"."""
+    rng = random.Random(seed)
+    rows = [["s"]] + [["{}.{}".format(i, j) for j in range(width)] for i in range(layers)] + [["t"]]
+    graph = {"t": []}
+    dead = 0
+    for row, following in zip(rows, rows[1:]):
+        for node in row:
+            neighbours = list(following)
+            for _ in range(sinks):
+                chain = ["dead{}".format(dead + k) for k in range(sink_depth)]
+                dead += sink_depth
+                for k, link in enumerate(chain):
+                    graph[link] = chain[k + 1:] if rng.random() < 0.5 else chain[k + 1:k + 2]
+                neighbours.append(chain[0])
+            rng.shuffle(neighbours)
+            graph[node] = neighbours
+    return graph
+
+
+def grid_graph(side, seed=0):
+    """4-connected side x side grid with random integer edge costs."""
+    rng = random.Random(seed)
+    graph = {}
+    for x in range(side):
+        for y in range(side):
+            graph[x, y] = {
+                (x + dx, y + dy): rng.randint(1, 10)
+                for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                if 0 <= x + dx < side and 0 <= y + dy < side
+            }
+    return graph
+
+
+def road_graph(n, seed=0, neighbours=4):
+    """Random points in the unit square, each joined both ways to its nearest
+    points along the x axis, with euclidean edge costs."""
+    rng = random.Random(seed)
+    points = sorted((rng.random(), rng.random()) for _ in range(n))
+    graph = {point: {} for point in points}
+    for i, point in enumerate(points):
+        for other in points[i + 1:i + 1 + neighbours]:
+            cost = math.dist(point, other)
+            graph[point][other] = graph[other][point] = cost
+    return graph
+
+
+def naive_dijkstra(graph, start, end):
+    """Textbook O(V^2) Dijkstra scanning every open node for the minimum."""
+    dist = {start: 0}
+    prev = {}
+    open_nodes = {start}
+    while open_nodes:
+        value = min(open_nodes, key=dist.__getitem__)
+        open_nodes.remove(value)
+        if value == end:
+            path = [end]
+            while path[-1] != start:
+                path.append(prev[path[-1]])
+            return path[::-1], dist[end]
+        for node, cost in graph[value].items():
+            if node not in dist or dist[value] + cost < dist[node]:
+                dist[node] = dist[value] + cost
+                prev[node] = value
+                open_nodes.add(node)
+
+
+def timed(func, *args, **kwargs):
+    begin = time.perf_counter()
+    result = func(*args, **kwargs)
+    return time.perf_counter() - begin, result
+
+
+def bench_bidirectional(sizes, degree, queries, seed):
+    print("{:>9} {:>12} {:>12} {:>8}".format("nodes", "bfs s", "bidir s", "speedup"))
+    for n in sizes:
+        graph_search = GraphSearch(random_graph(n, degree, seed))
+        rng = random.Random(seed)
+        pairs = [(rng.randrange(n), rng.randrange(n)) for _ in range(queries)]
+        # the reverse index is built on demand; keep it out of the timings
+        graph_search.reverse_graph()
+
+        single = bidir = 0.0
+        for start, end in pairs:
+            elapsed, expected = timed(graph_search.find_shortest_path_bfs, start, end)
+            single += elapsed
+            elapsed, path = timed(graph_search.find_shortest_path_bfs, start, end, bidirectional=True)
+            bidir += elapsed
+            assert (expected is None) == (path is None)
+            assert expected is None or len(expected) == len(path)
+        print("{:>9} {:>12.4f} {:>12.4f} {:>7.1f}x".format(n, single, bidir, single / bidir))
+
+
+def bench_weighted(sizes, queries, seed):
+    print("{:<6} {:>9} {:>12} {:>12} {:>12}".format("graph", "nodes", "naive s", "dijkstra s", "astar s"))
+    for n in sizes:
+        side = int(math.sqrt(n))
+        cases = [
+            ("grid", grid_graph(side, seed), lambda a, b: abs(a[0] - b[0]) + abs(a[1] - b[1])),
+            ("road", road_graph(n, seed), math.dist),
+        ]
+        for name, graph, distance in cases:
+            graph_search = GraphSearch(graph)
+            nodes = list(graph)
+            rng = random.Random(seed)
+            pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(queries)]
+            naive = dijkstra = astar = 0.0
+            for start, end in pairs:
+                elapsed, expected = timed(naive_dijkstra, graph, start, end)
+                naive += elapsed
+                elapsed, result = timed(graph_search.find_shortest_path_dijkstra, start, end)
+                dijkstra += elapsed
+                heuristic = lambda node: distance(node, end)
+                elapsed, guided = timed(graph_search.find_shortest_path_astar, start, end, heuristic)
+                astar += elapsed
+                if expected is not None:
+                    assert math.isclose(expected[1], result[1]) and math.isclose(expected[1], guided[1])
+            print("{:<6} {:>9} {:>12.4f} {:>12.4f} {:>12.4f}".format(name, len(graph), naive, dijkstra, astar))
+
+
+def bench_pruning(sizes, seed):
+    row = "{:>7} {:>9} {:>8} {:>12.4f} {:>12.4f} {:>7.1f}x"
+    header = ("layers", "nodes", "paths", "unpruned s", "pruned s", "speedup")
+    print("{:>7} {:>9} {:>8} {:>12} {:>12} {:>8}".format(*header))
+    for layers in sizes:
+        graph_search = GraphSearch(sink_heavy_graph(layers, seed=seed))
+        unpruned, expected = timed(graph_search.find_all_paths_dfs, "s", "t", prune=False)
+        pruned, paths = timed(graph_search.find_all_paths_dfs, "s", "t")
+        assert paths == expected
+        nodes = len(graph_search.graph)
+        print(row.format(layers, nodes, len(paths), unpruned, pruned, unpruned / pruned))
+
+
+# graph family -> builder(size, seed); every builder is deterministic
+FAMILIES = {
+    "random": lambda size, seed: random_graph(size, 4, seed),
+    "scale_free": lambda size, seed: scale_free_graph(size, 2, seed),
+    "grid": lambda size, seed: grid_graph(max(2, math.isqrt(size)), seed),
+    "chain": chain_graph,
+    # each layer of the sink-heavy graph holds about 75 nodes
+    "sink_heavy": lambda size, seed: sink_heavy_graph(max(1, size // 75), seed=seed),
+}
+
+METHODS = [
+    "find_path_dfs",
+    "find_all_paths_dfs",
+    "find_shortest_path_dfs",
+    "find_shortest_path_bfs",
+    "find_shortest_path_dijkstra",
+]
+
+
+def suite_queries(family, graph, queries, seed):
+    if family == "chain":
+        return [(0, len(graph))]
+    if family == "sink_heavy":
+        return [("s", "t")]
+    # unreachable pairs would send the DFS methods through every simple
+    # path, so draw each end from the nodes reachable from its start
+    nodes = list(graph)
+    rng = random.Random(seed)
+    graph_search = GraphSearch(graph)
+    pairs = []
+    # give up on graphs where hardly any start reaches another node
+    for _ in range(queries * 20):
+        if len(pairs) == queries:
+            break
+        start = rng.choice(nodes)
+        reached = [node for layer in graph_search.bfs_layers(start) for node in layer][1:]
+        if reached:
+            pairs.append((start, rng.choice(reached)))
+    if not pairs:
+        raise ValueError("no node of the {} graph reaches another".format(family))
+    return pairs
+
+
+def measure(family, size, method, seed, queries, repeat):
+    """Best-of-`repeat` time for running `method` over the query set, then
+    the tracemalloc peak of one more run."""
+    graph = FAMILIES[family](size, seed)
+    pairs = suite_queries(family, graph, queries, seed)
+    graph_search = GraphSearch(graph)
+    search = getattr(graph_search, method)
+    graph_search.reverse_graph()
+
+    seconds = math.inf
+    for _ in range(repeat):
+        begin = time.perf_counter()
+        for start, end in pairs:
+            search(start, end)
+        seconds = min(seconds, time.perf_counter() - begin)
+
+    tracemalloc.start()
+    for start, end in pairs:
+        search(start, end)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {"nodes": len(graph), "seconds": seconds, "peak_bytes": peak_bytes}
+
+
+def _measure_into(results, *args):
+    results.put(measure(*args))
+
+
+def run_suite(families, sizes, methods, seed, queries, repeat, timeout):
+    """Measure every (family, size, method) in a child process so that an
+    exponential search can be cut off after `timeout` seconds."""
+    results = []
+    for family in families:
+        for size in sizes:
+            for method in methods:
+                record = {"family": family, "size": size, "method": method}
+                queue = multiprocessing.Queue()
+                child = multiprocessing.Process(
+                    target=_measure_into, args=(queue, family, size, method, seed, queries, repeat)
+                )
+                child.start()
+                child.join(timeout)
+                if child.is_alive():
+                    child.terminate()
+                    child.join()
+                    record.update(status="timeout", nodes=None, seconds=None, peak_bytes=None)
+                elif child.exitcode:
+                    record.update(status="error", nodes=None, seconds=None, peak_bytes=None)
+                else:
+                    record.update(status="ok", **queue.get())
+                print(
+                    "{family:<11} {size:>8} {method:<28} {status:<8} {seconds} {peak_bytes}".format(**record),
+                    flush=True,
+                )
+                results.append(record)
+    return results
+
+
+def compare(baseline, current, threshold):
+    """Return the results of `current` that got slower or hungrier than in
+    `baseline` by more than `threshold` (0.1 = 10%), or stopped finishing."""
+    before = {(r["family"], r["size"], r["method"]): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = before.get((result["family"], result["size"], result["method"]))
+        if old is None or old["status"] != "ok":
+            continue
+        if result["status"] != "ok":
+            regressions.append((result, "status", old["status"], result["status"]))
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if result[metric] > old[metric] * (1 + threshold):
+                regressions.append((result, metric, old[metric], result[metric]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="benchmark", required=True)
+
+    command = commands.add_parser("bidirectional", help="single-ended vs bidirectional BFS")
+    command.add_argument("--sizes", type=int, nargs="+", default=[100000, 1000000])
+    command.add_argument("--degree", type=int, default=4)
+    command.add_argument("--queries", type=int, default=20)
+    command.add_argument("--seed", type=int, default=0)
+
+    command = commands.add_parser("weighted", help="naive Dijkstra vs heap Dijkstra vs A*")
+    command.add_argument("--sizes", type=int, nargs="+", default=[2500, 10000])
+    command.add_argument("--queries", type=int, default=20)
+    command.add_argument("--seed", type=int, default=0)
+
+    command = commands.add_parser("pruning", help="all-paths DFS with and without dead-end pruning")
+    command.add_argument("--sizes", type=int, nargs="+", default=[4, 6, 8], help="numbers of layers")
+    command.add_argument("--seed", type=int, default=0)
+
+    command = commands.add_parser("suite", help="scaling suite over every find_* method")
+    command.add_argument("--families", nargs="+", choices=sorted(FAMILIES), default=list(FAMILIES))
+    command.add_argument("--methods", nargs="+", choices=METHODS, default=METHODS)
+    command.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    command.add_argument("--queries", type=int, default=5)
+    command.add_argument("--repeat", type=int, default=3)
+    command.add_argument("--timeout", type=float, default=10, help="seconds per measurement")
+    command.add_argument("--seed", type=int, default=0)
+    command.add_argument("--output", default="graph_search_bench.json")
+
+    command = commands.add_parser("compare", help="flag regressions between two suite results")
+    command.add_argument("baseline")
+    command.add_argument("current")
+    command.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args()
+    if args.benchmark == "bidirectional":
+        bench_bidirectional(args.sizes, args.degree, args.queries, args.seed)
+    elif args.benchmark == "weighted":
+        bench_weighted(args.sizes, args.queries, args.seed)
+    elif args.benchmark == "pruning":
+        bench_pruning(args.sizes, args.seed)
+    elif args.benchmark == "suite":
+        results = run_suite(args.families, args.sizes, args.methods, args.seed, args.queries, args.repeat, args.timeout)
+        meta = {
+            "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            "python": sys.version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "queries": args.queries,
+            "repeat": args.repeat,
+        }
+        with open(args.output, "w") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+    elif args.benchmark == "compare":
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            current = json.load(f)
+        regressions = compare(baseline, current, args.threshold)
+        for result, metric, old, new in regressions:
+            print("REGRESSION {family} {size} {method}:".format(**result), metric, old, "->", new)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,176 @@
+"""
+Benchmarks for patterns/creational/pool.py.
+
+Run with the package installed (``pip install -e .``), e.g.:
+
+    python benchmarks/bench_pool.py contention --threads 1 8 32 64
+
+contention measures checkout throughput of `with ObjectPool(...)` around a
+pre-filled queue.Queue, a BoundedPool and a ThreadCachedPool while every
+thread checks objects out and back in as fast as it can.
+
+metrics measures what recording PoolMetrics costs per checkout:
+
+    python benchmarks/bench_pool.py metrics --threads 1 8 --work 0 100 --repeat 5
+
+An empty `with` block is the worst case: the added cost per checkout is
+roughly fixed, so it is a larger share the less else a checkout does.
+--work holds each object for a while, as real callers do.
+
+buffers compares allocating bytearray(n) per request with borrowing n
+bytes from a BufferPool, with and without an arena and zero-filling:
+
+    python benchmarks/bench_pool.py buffers --sizes 64 4096 65536 1048576
+
+prewarm times building a pool of objects whose factory waits --cost
+seconds (as on a network round trip) with increasing numbers of workers:
+
+    python benchmarks/bench_pool.py prewarm --objects 200 --workers 1 4 16
+"""
+
+import argparse
+import queue
+import threading
+import time
+import timeit
+
+from patterns.creational.pool import BoundedPool, BufferPool, ObjectPool, PoolMetrics, ThreadCachedPool
+
+
+def queue_pool(size):
+    pool = queue.Queue()
+    for item in range(size):
+        pool.put(item)
+    return pool
+
+
+POOLS = {
+    "queue": queue_pool,
+    "bounded": lambda size: BoundedPool(object, size, min_idle=size),
+    "thread_cached": lambda size: ThreadCachedPool(object, size, min_idle=size),
+}
+
+
+def checkout_rate(pool, threads, checkouts, work=0):
+    """Checkouts per second with `threads` threads doing `checkouts` each,
+    holding each object while summing range(work)."""
+    start = threading.Barrier(threads + 1)
+    held = range(work)
+
+    def run():
+        start.wait()
+        for _ in range(checkouts):
+            with ObjectPool(pool):
+                sum(held)
+
+    workers = [threading.Thread(target=run) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    start.wait()
+    began = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return threads * checkouts / (time.perf_counter() - began)
+
+
+def bench_contention(thread_counts, checkouts, size):
+    print("{:>8}".format("threads") + "".join("{:>18}".format(name + " /s") for name in POOLS))
+    for threads in thread_counts:
+        # enough objects that nobody waits: this measures locking, not scarcity
+        rates = [checkout_rate(build(size or threads), threads, checkouts) for build in POOLS.values()]
+        print("{:>8}".format(threads) + "".join("{:>18,.0f}".format(rate) for rate in rates))
+
+
+def bench_metrics(thread_counts, checkouts, works, repeat):
+    header = ("pool", "threads", "work", "plain /s", "metrics /s", "overhead", "ns/checkout")
+    print("{:<14} {:>8} {:>6} {:>14} {:>14} {:>9} {:>12}".format(*header))
+    for name, cls in (("bounded", BoundedPool), ("thread_cached", ThreadCachedPool)):
+        for threads in thread_counts:
+            for work in works:
+                # best of several runs, alternating, to keep scheduling noise out
+                plain = measured = 0.0
+                for _ in range(repeat):
+                    pool = cls(object, threads, min_idle=threads)
+                    plain = max(plain, checkout_rate(pool, threads, checkouts, work))
+                    pool = cls(object, threads, min_idle=threads, metrics=PoolMetrics())
+                    measured = max(measured, checkout_rate(pool, threads, checkouts, work))
+                row = (name, threads, work, plain, measured, plain / measured - 1, (1 / measured - 1 / plain) * 1e9)
+                print("{:<14} {:>8} {:>6} {:>14,.0f} {:>14,.0f} {:>8.1%} {:>12.0f}".format(*row))
+
+
+def bench_buffers(sizes, requests):
+    pools = {
+        "pool": BufferPool(max_size=max(sizes)),
+        "arena": BufferPool(max_size=max(sizes), arena_size=max(sizes)),
+        "zeroed": BufferPool(max_size=max(sizes), zero_on_release=True),
+    }
+    names = ["bytearray"] + list(pools)
+    print("{:>9}".format("bytes") + "".join("{:>14}".format(name + " us") for name in names))
+    for n in sizes:
+
+        def allocate():
+            buf = bytearray(n)
+            buf[-1] = 1
+
+        def borrow(pool):
+            with pool.checkout(n) as buf:
+                buf[-1] = 1
+
+        runs = [allocate] + [lambda pool=pool: borrow(pool) for pool in pools.values()]
+        times = [min(timeit.repeat(run, number=requests, repeat=5)) / requests for run in runs]
+        print("{:>9}".format(n) + "".join("{:>14.3f}".format(seconds * 1e6) for seconds in times))
+
+
+def bench_prewarm(objects, cost, worker_counts):
+    def connect():
+        time.sleep(cost)
+        return object()
+
+    print("{:>8} {:>10} {:>8}".format("workers", "seconds", "speedup"))
+    baseline = None
+    for workers in worker_counts:
+        pool = BoundedPool(connect, objects)
+        began = time.perf_counter()
+        pool.prewarm(objects, workers=workers)
+        elapsed = time.perf_counter() - began
+        baseline = baseline or elapsed
+        print("{:>8} {:>10.3f} {:>7.1f}x".format(workers, elapsed, baseline / elapsed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="benchmark", required=True)
+
+    command = commands.add_parser("contention", help="checkout throughput by number of threads")
+    command.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32, 64])
+    command.add_argument("--checkouts", type=int, default=20000, help="per thread")
+    command.add_argument("--size", type=int, default=0, help="pooled objects (default: one per thread)")
+
+    command = commands.add_parser("metrics", help="checkout throughput with and without PoolMetrics")
+    command.add_argument("--threads", type=int, nargs="+", default=[1, 8, 32])
+    command.add_argument("--checkouts", type=int, default=20000, help="per thread")
+    command.add_argument("--work", type=int, nargs="+", default=[0, 100], help="held for sum(range(work))")
+    command.add_argument("--repeat", type=int, default=3)
+
+    command = commands.add_parser("buffers", help="bytearray(n) per request vs BufferPool")
+    command.add_argument("--sizes", type=int, nargs="+", default=[64, 4096, 65536, 1048576])
+    command.add_argument("--requests", type=int, default=10000)
+
+    command = commands.add_parser("prewarm", help="cold start time by number of prewarm workers")
+    command.add_argument("--objects", type=int, default=200)
+    command.add_argument("--cost", type=float, default=0.01, help="seconds per factory call")
+    command.add_argument("--workers", type=int, nargs="+", default=[1, 4, 16])
+
+    args = parser.parse_args()
+    if args.benchmark == "contention":
+        bench_contention(args.threads, args.checkouts, args.size)
+    elif args.benchmark == "metrics":
+        bench_metrics(args.threads, args.checkouts, args.work, args.repeat)
+    elif args.benchmark == "buffers":
+        bench_buffers(args.sizes, args.requests)
+    elif args.benchmark == "prewarm":
+        bench_prewarm(args.objects, args.cost, args.workers)
+
+
+if __name__ == "__main__":
+    main()
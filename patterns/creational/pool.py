@@ -17,6 +17,19 @@ with statement. But because it is released back into the pool
 afterwards it is reused by the explicit call to sample_queue.get().
 Same thing happens with "sam", when the ObjectPool created inside the
 function is deleted (by the GC) and the object is returned.
+BoundedPool is a drop-in replacement for the pre-filled queue: it creates
+objects through a factory only when none is idle, never holds more than
+max_size of them, and raises PoolExhausted instead of blocking forever
+when a timeout expires. ThreadCachedPool puts a small free list per thread
+in front of it, so busy threads rarely contend for its lock. Both can
+validate, reset and retire objects, and shrink back to min_idle when
+traffic drops. They are also fork-safe: a child process drops the objects
+it inherited (sockets shared with the parent, say) and creates its own.
+AsyncObjectPool is the asyncio counterpart: waiting for an object suspends
+the task instead of blocking the event loop, and `async with pool.acquire()`
+checks it out and returns it exactly like `with ObjectPool(...)`.
+BufferPool pools raw memory: `with pool.checkout(n) as buf` lends a
+memoryview of n bytes carved from a reused buffer of the next size class.
 
 *Where is the pattern used practically?
 
@@ -29,14 +42,45 @@ Stores a set of initialized objects kept ready to use.
 """
 
 
+import asyncio
+import inspect
+import logging
+import os
+import queue
+import threading
+import time
+import weakref
+from bisect import bisect_left
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from math import inf
+
+
+_log = logging.getLogger(__name__)
+
+
+class PoolExhausted(queue.Empty):
+    """Raised when no pooled object became available within the timeout."""
+
+
+# returned by _take_idle when there is no idle object (None may be pooled)
+_NOTHING = object()
+
+
 class ObjectPool:
-    def __init__(self, queue, auto_get=False):
+    def __init__(self, queue, auto_get=False, timeout=None):
         self._queue = queue
-        self.item = self._queue.get() if auto_get else None
+        self._timeout = timeout
+        self.item = self._get() if auto_get else None
+
+    def _get(self):
+        if self._timeout is None:
+            return self._queue.get()
+        return self._queue.get(timeout=self._timeout)
 
     def __enter__(self):
         if self.item is None:
-            self.item = self._queue.get()
+            self.item = self._get()
         return self.item
 
     def __exit__(self, Type, value, traceback):
@@ -50,6 +94,986 @@ class ObjectPool:
             self.item = None
 
 
+class BoundedPool:
+    """Creates objects lazily through factory, never more than max_size.
+
+    min_idle objects are created up front. It offers the get/put interface
+    of queue.Queue, so ObjectPool can wrap it exactly as it wraps a queue;
+    checkout() does that for you.
+
+    Optional hooks keep stale objects out: validate(item) is asked before
+    an idle object is handed out, reset(item) is called when one comes
+    back, and close(item) when one is dropped (an error from close is
+    logged, not raised). An object is dropped when validate or reset
+    returns False or raises, when it is older than
+    max_lifetime seconds, or when it has been idle for idle_ttl seconds
+    while more than min_idle are idle. With idle_ttl or max_lifetime set,
+    a daemon thread calls reap() every reap_interval seconds (by default
+    half the shorter limit) until shutdown(), logging any error it hits
+    and trying again next time.
+
+    Pass a PoolMetrics as metrics to count checkouts and time waits and
+    holds; metrics_snapshot() then reports them.
+
+    In a child process created by os.fork() the pool starts out empty:
+    objects created in the parent are dropped without calling close (that
+    could affect the parent's copy), and ones checked out at the fork are
+    let go when released. New objects are created on demand, so a parent
+    can prewarm the pool before forking workers."""
+
+    def __init__(
+        self,
+        factory,
+        max_size,
+        min_idle=0,
+        validate=None,
+        reset=None,
+        close=None,
+        idle_ttl=None,
+        max_lifetime=None,
+        reap_interval=None,
+        metrics=None,
+    ):
+        if not 0 <= min_idle <= max_size:
+            raise ValueError("min_idle must be between 0 and max_size")
+        self.factory = factory
+        self.max_size = max_size
+        self.min_idle = min_idle
+        self.validate = validate
+        self.reset = reset
+        self.close = close
+        self.idle_ttl = idle_ttl
+        self.max_lifetime = max_lifetime
+        self.metrics = metrics
+        self._idle = deque()
+        # id(item) -> [created, last released] for every live object
+        self._stamps = {}
+        # ids of objects checked out when this process was forked
+        self._inherited = set()
+        self._size = 0
+        self._available = threading.Condition()
+        # threads in acquire_many waiting for several objects at once
+        self._batch_waiting = 0
+        for _ in range(min_idle):
+            self._size += 1
+            self._idle.append(self._create())
+        self._stopped = threading.Event()
+        self._periodic = []
+        limits = [limit for limit in (idle_ttl, max_lifetime) if limit is not None]
+        if limits:
+            self._every(reap_interval if reap_interval is not None else min(limits) / 2, BoundedPool.reap)
+        if metrics is not None and metrics.export is not None:
+            self._every(metrics.interval, BoundedPool.export_metrics)
+        _POOLS.add(self)
+
+    def _every(self, interval, action):
+        self._periodic.append((interval, action))
+        args = (weakref.ref(self), self._stopped, interval, action)
+        threading.Thread(target=_run_periodically, args=args, daemon=True).start()
+
+    def _after_fork(self):
+        # in the child: the lock may have been held by a thread that no
+        # longer exists, and every object belongs to the parent
+        self._available = threading.Condition()
+        self._batch_waiting = 0
+        for item in self._idle:
+            self._stamps.pop(id(item), None)
+        self._idle = deque()
+        self._inherited = set(self._stamps)
+        self._stamps = {}
+        self._size = 0
+        if self.metrics is not None:
+            self.metrics._after_fork()
+        if self._stopped.is_set():
+            return
+        # threads other than the forking one do not survive the fork
+        self._stopped = threading.Event()
+        periodic, self._periodic = self._periodic, []
+        for interval, action in periodic:
+            self._every(interval, action)
+
+    @property
+    def size(self):
+        """Objects created and not discarded, idle or checked out."""
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        """Return an idle object, or a new one while below max_size.
+
+        Otherwise wait for a release; raise PoolExhausted if none comes
+        within timeout seconds (None waits forever)."""
+        metrics = self.metrics
+        if metrics is None:
+            return self._acquire(timeout)
+        try:
+            shard = metrics._local.shard
+        except AttributeError:
+            shard = metrics.shard()
+        # untimed checkouts are only counted down here, and added to
+        # checkouts a whole round at a time
+        shard.countdown -= 1
+        if shard.countdown:
+            return self._acquire(timeout)
+        shard.countdown = metrics.sample_every
+        shard.checkouts += metrics.sample_every
+        began = time.perf_counter()
+        item = self._acquire(timeout)
+        metrics.waited(shard, item, time.perf_counter() - began)
+        return item
+
+    def _acquire(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._available:
+                while True:
+                    item = self._take_idle()
+                    if item is not _NOTHING:
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        if self.metrics is not None:
+                            self.metrics.shard().timeouts += 1
+                        raise PoolExhausted(
+                            "all {} objects are checked out; none was released within {}s".format(
+                                self.max_size, timeout
+                            )
+                        )
+                    self._available.wait(remaining)
+            # run the (possibly slow) hooks and factory without holding the lock
+            if item is _NOTHING:
+                if self.metrics is not None:
+                    self.metrics.shard().misses += 1
+                return self._create()
+            if self._usable(item):
+                return item
+            self._drop(item)
+
+    def _take_idle(self):
+        # called with the lock held
+        return self._idle.popleft() if self._idle else _NOTHING
+
+    def _create(self):
+        # the caller has already counted the new object in _size
+        try:
+            item = self.factory()
+        except BaseException:
+            self._forget()
+            raise
+        now = time.monotonic()
+        self._stamps[id(item)] = [now, now]
+        if self._inherited:
+            # the inherited object with this id must be gone
+            self._inherited.discard(id(item))
+        if self.metrics is not None:
+            self.metrics.shard().creations += 1
+        return item
+
+    def _expired(self, item, now):
+        if self.max_lifetime is None or id(item) not in self._stamps:
+            return False
+        return now - self._stamps[id(item)][0] >= self.max_lifetime
+
+    def _usable(self, item):
+        if self.max_lifetime is not None and self._expired(item, time.monotonic()):
+            return False
+        try:
+            return self.validate is None or self.validate(item) is not False
+        except Exception:
+            return False
+
+    def _recycle(self, item):
+        """Prepare a returned object for reuse; False if it was dropped."""
+        if self.reset is None and self.max_lifetime is None and self.idle_ttl is None:
+            return True
+        now = time.monotonic()
+        try:
+            usable = not self._expired(item, now) and (self.reset is None or self.reset(item) is not False)
+        except Exception:
+            usable = False
+        if not usable:
+            self._drop(item)
+            return False
+        # objects put in from outside count as created now
+        self._stamps.setdefault(id(item), [now, now])[1] = now
+        return True
+
+    def _drop(self, item):
+        self._stamps.pop(id(item), None)
+        self._forget()
+        self._close(item)
+
+    def _close(self, item):
+        # the object is being thrown away, often because it is broken, so a
+        # failing close must not fail the checkout or return around it
+        if self.close is None:
+            return
+        try:
+            self.close(item)
+        except Exception:
+            _log.exception("closing %r failed", item)
+
+    def release(self, item):
+        if self._inherited and self._let_go(item):
+            return
+        metrics = self.metrics
+        if metrics is not None and metrics.held_since:
+            # inlined: most returns are of untimed checkouts
+            began = metrics.held_since.pop(id(item), None)
+            if began is not None:
+                metrics.held(time.perf_counter() - began)
+        self._release(item)
+
+    def _release(self, item):
+        if not self._recycle(item):
+            return
+        with self._available:
+            self._idle.append(item)
+            self._notify()
+
+    def discard(self, item):
+        """Drop a checked-out object instead of returning it to the pool."""
+        if self._inherited and self._let_go(item):
+            return
+        metrics = self.metrics
+        if metrics is not None and metrics.held_since:
+            began = metrics.held_since.pop(id(item), None)
+            if began is not None:
+                metrics.held(time.perf_counter() - began)
+        self._drop(item)
+
+    def acquire_many(self, n, timeout=None):
+        """Return a list of n objects, checked out together.
+
+        Nothing is taken until all n can be had at once, so callers that
+        each need several objects never hold some while waiting for the
+        rest. Raise PoolExhausted if that does not happen within timeout
+        seconds."""
+        if n > self.max_size:
+            raise ValueError("cannot check out {} objects from a pool of {}".format(n, self.max_size))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        metrics = self.metrics
+        with self._available:
+            while True:
+                if self.idle + self.max_size - self._size >= n:
+                    items = self._take_batch(n)
+                    if items is not None:
+                        break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    if metrics is not None:
+                        shard = metrics.shard()
+                        shard.checkouts += 1
+                        shard.timeouts += 1
+                    raise PoolExhausted("{} objects were not free at once within {}s".format(n, timeout))
+                self._batch_waiting += 1
+                try:
+                    self._available.wait(remaining)
+                finally:
+                    self._batch_waiting -= 1
+        usable = []
+        for item in items:
+            if self._usable(item):
+                usable.append(item)
+                continue
+            # drop it, but keep its slot for the replacement
+            self._stamps.pop(id(item), None)
+            self._close(item)
+        created = 0
+        try:
+            while len(usable) < n:
+                usable.append(self._create())
+                created += 1
+        except BaseException:
+            for _ in range(n - len(usable) - 1):
+                self._forget()
+            for item in usable:
+                self._release(item)
+            raise
+        if metrics is not None:
+            shard = metrics.shard()
+            shard.checkouts += n
+            shard.misses += created
+        return usable
+
+    def _take_batch(self, n):
+        """Take n objects, reserving slots for those to be created; None if
+        fewer are free than counted. Called with the lock held."""
+        items = []
+        while len(items) < n:
+            item = self._take_idle()
+            if item is _NOTHING:
+                break
+            items.append(item)
+        if n - len(items) > self.max_size - self._size:
+            # an owner took objects back from its thread list meanwhile
+            self._idle.extendleft(reversed(items))
+            return None
+        # the rest are created in slots reserved now
+        self._size += n - len(items)
+        return items
+
+    def _let_go(self, item):
+        """True if item was checked out in the parent process."""
+        if id(item) not in self._inherited:
+            return False
+        self._inherited.discard(id(item))
+        return True
+
+    def _forget(self):
+        with self._available:
+            self._size -= 1
+            self._notify()
+
+    def _notify(self):
+        # called with the lock held. A batch waiter woken by notify() may
+        # need more than one object and go back to sleep, swallowing the
+        # wakeup a plain acquire() was waiting for, so wake everyone then
+        if self._batch_waiting:
+            self._available.notify_all()
+        else:
+            self._available.notify()
+
+    def reap(self):
+        """Drop expired idle objects, then create new ones up to min_idle."""
+        now = time.monotonic()
+        dropped = []
+        with self._available:
+            kept = deque()
+            while self._idle:
+                item = self._idle.popleft()
+                idle_since = self._stamps[id(item)][1]
+                stale = self.idle_ttl is not None and now - idle_since >= self.idle_ttl
+                # the remaining objects still count as idle, kept or not
+                if self._expired(item, now) or (stale and len(kept) + len(self._idle) >= self.min_idle):
+                    dropped.append(item)
+                else:
+                    kept.append(item)
+            self._idle = kept
+            missing = min(self.min_idle - len(kept), self.max_size - (self._size - len(dropped)))
+        for item in dropped:
+            self._drop(item)
+        if missing > 0:
+            self.prewarm(missing)
+        return len(dropped)
+
+    def prewarm(self, n, workers=1):
+        """Create up to n more idle objects, running workers factory calls at a time.
+
+        Stops at max_size and returns the number created. If the factory
+        raises, the objects already made stay in the pool and the first
+        error is re-raised once all calls have finished."""
+        with self._available:
+            count = max(0, min(n, self.max_size - self._size))
+            self._size += count
+
+        def add():
+            item = self._create()
+            with self._available:
+                self._idle.append(item)
+                self._notify()
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(add) for _ in range(count)]
+        errors = [future.exception() for future in futures if future.exception() is not None]
+        if errors:
+            raise errors[0]
+        return count
+
+    def metrics_snapshot(self):
+        """The metrics' snapshot plus current size, idle and in_use counts."""
+        if self.metrics is None:
+            raise ValueError("this pool was created without metrics")
+        snapshot = self.metrics.snapshot()
+        size, idle = self.size, self.idle
+        snapshot.update(size=size, idle=idle, in_use=max(size - idle, 0))
+        return snapshot
+
+    def export_metrics(self):
+        """Pass metrics_snapshot() to the metrics' export callback."""
+        self.metrics.export(self.metrics_snapshot())
+
+    def shutdown(self):
+        """Stop the reaper and metrics export threads, if any."""
+        self._stopped.set()
+
+    def get(self, block=True, timeout=None):
+        return self.acquire(timeout if block else 0)
+
+    def put(self, item):
+        self.release(item)
+
+    def checkout(self, timeout=None):
+        return ObjectPool(self, timeout=timeout)
+
+
+# every live BoundedPool, reset in the child after a fork
+_POOLS = weakref.WeakSet()
+
+
+def _after_fork_in_child():
+    for pool in list(_POOLS):
+        pool._after_fork()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def _run_periodically(pool_ref, stop, interval, action):
+    # holds the pool only weakly, so an unused pool can still be collected
+    while not stop.wait(interval):
+        pool = pool_ref()
+        if pool is None:
+            return
+        try:
+            action(pool)
+        except Exception:
+            # a failed reap or export is retried on the next round
+            _log.exception("%s failed; retrying in %ss", action.__name__, interval)
+        del pool
+
+
+class ThreadCachedPool(BoundedPool):
+    """BoundedPool with a small free list per thread in front of the shared store.
+
+    A thread puts released objects on its own list and takes them back
+    from there without locking. Only when that list is empty or holds more
+    than cache_size objects does it lock the shared store, moving batch
+    objects at once. A thread that finds the store empty at max_size takes
+    objects from other threads' lists rather than wait for them. Objects
+    on a thread's list are checked when they are taken from it; reap()
+    first moves those that have sat there for idle_ttl seconds, or
+    outlived max_lifetime, to the shared store and then reaps that. When a
+    thread exits, its list is moved back to the shared store."""
+
+    def __init__(self, factory, max_size, min_idle=0, cache_size=8, batch=4, **hooks):
+        if not 1 <= batch <= cache_size:
+            raise ValueError("batch must be between 1 and cache_size")
+        self.cache_size = cache_size
+        self.batch = batch
+        self._local = threading.local()
+        # every live thread's list, so others can take from it; set before
+        # the reaper thread starts
+        self._caches = []
+        self._waiting = 0
+        super().__init__(factory, max_size, min_idle, **hooks)
+
+    @property
+    def idle(self):
+        return len(self._idle) + sum(len(cache) for cache in self._caches)
+
+    def _cache(self):
+        try:
+            return self._local.cache
+        except AttributeError:
+            pass
+        cache = self._local.cache = deque()
+        # the thread's locals, and so the token, are dropped when it exits
+        token = self._local.token = _ThreadToken()
+        weakref.finalize(token, _reclaim_cache, weakref.ref(self), cache)
+        with self._available:
+            self._caches.append(cache)
+        return cache
+
+    def _reclaim(self, cache):
+        """Move an exited thread's list to the shared store."""
+        with self._available:
+            for index, other in enumerate(self._caches):
+                if other is cache:
+                    del self._caches[index]
+                    break
+            else:
+                # a list from before a fork: its objects were dropped then
+                return
+        self._spill(cache, len(cache))
+
+    def reap(self):
+        if self.idle_ttl is not None or self.max_lifetime is not None:
+            now = time.monotonic()
+            with self._available:
+                for cache in self._caches:
+                    self._spill_stale(cache, now)
+        return super().reap()
+
+    def _spill_stale(self, cache, now):
+        # called with the lock held. The owner releases to and takes from
+        # the right end, so the left end holds the objects idle longest.
+        # The owner may pop concurrently; moving a fresher object than the
+        # one looked at only sends it to the shared store early
+        while True:
+            try:
+                item = cache[0]
+            except IndexError:
+                return
+            stamps = self._stamps.get(id(item))
+            if stamps is None:
+                return
+            expired = self.max_lifetime is not None and now - stamps[0] >= self.max_lifetime
+            if not expired and (self.idle_ttl is None or now - stamps[1] < self.idle_ttl):
+                return
+            try:
+                self._idle.append(cache.popleft())
+            except IndexError:
+                return
+
+    def _acquire(self, timeout):
+        # the owner works on the right end of its list, other threads take
+        # from the left; single deque operations need no lock
+        cache = self._cache()
+        while cache:
+            try:
+                item = cache.pop()
+            except IndexError:
+                break
+            if self._usable(item):
+                return item
+            self._drop(item)
+        with self._available:
+            self._waiting += 1
+        try:
+            return super()._acquire(timeout)
+        finally:
+            with self._available:
+                self._waiting -= 1
+
+    def acquire_many(self, n, timeout=None):
+        with self._available:
+            self._waiting += 1
+        try:
+            return super().acquire_many(n, timeout)
+        finally:
+            with self._available:
+                self._waiting -= 1
+
+    def _take_idle(self):
+        if self._idle:
+            # refill our list too, unless other threads are waiting
+            item = self._idle.popleft()
+            if self._waiting == 1:
+                cache = self._cache()
+                for _ in range(min(self.batch - 1, len(self._idle))):
+                    cache.append(self._idle.popleft())
+            return item
+        for cache in self._caches:
+            try:
+                return cache.popleft()
+            except IndexError:
+                pass
+        return _NOTHING
+
+    def _after_fork(self):
+        for cache in self._caches:
+            for item in cache:
+                self._stamps.pop(id(item), None)
+        self._local = threading.local()
+        self._caches = []
+        self._waiting = 0
+        super()._after_fork()
+
+    def _release(self, item):
+        if not self._recycle(item):
+            return
+        cache = self._cache()
+        cache.append(item)
+        if len(cache) > self.cache_size:
+            self._spill(cache, self.batch)
+        elif self._waiting:
+            # a thread is in acquire() and may have missed our list
+            self._spill(cache, 1)
+
+    def _spill(self, cache, count):
+        with self._available:
+            for _ in range(count):
+                try:
+                    self._idle.append(cache.popleft())
+                except IndexError:
+                    break
+                self._notify()
+
+
+class _ThreadToken:
+    """Kept in a thread's locals only, to tell when the thread has exited."""
+
+
+def _reclaim_cache(pool_ref, cache):
+    # holds the pool only weakly, like _run_periodically
+    pool = pool_ref()
+    if pool is not None:
+        pool._reclaim(cache)
+
+
+def _retire_shard(metrics_ref, shard):
+    metrics = metrics_ref()
+    if metrics is not None:
+        metrics._retire(shard)
+
+
+class PoolMetrics:
+    """Checkout counts and wait/hold time histograms for a BoundedPool.
+
+    Every thread counts into its own shard, so recording takes no lock;
+    snapshot() adds the shards up, and a thread's shard is folded into a
+    running total when the thread exits. Every checkout is counted, but
+    only one in sample_every has its wait and hold timed; the others cost
+    one counter decrement at checkout and, while a timed object is out,
+    one dict lookup on return. Histogram buckets hold the number of timed
+    waits (or holds) up to each bound in BUCKETS, not cumulative counts,
+    plus one for anything longer. If export is given, the pool
+    calls it with metrics_snapshot() every interval seconds."""
+
+    BUCKETS = (0.00001, 0.0001, 0.001, 0.01, 0.1, 1.0, 10.0)
+
+    def __init__(self, export=None, interval=60.0, sample_every=64):
+        self.export = export
+        self.interval = interval
+        self.sample_every = sample_every
+        self._local = threading.local()
+        # the shards of live threads, and the sum of those that exited
+        self._shards = []
+        self._retired = _MetricsShard(len(self.BUCKETS) + 1)
+        self._lock = threading.Lock()
+        # id(item) -> perf_counter() at checkout, for timed checkouts
+        self.held_since = {}
+
+    def _after_fork(self):
+        # the child starts counting from zero
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _MetricsShard(len(self.BUCKETS) + 1)
+        self._lock = threading.Lock()
+        self.held_since = {}
+
+    def shard(self):
+        """This thread's counters."""
+        try:
+            return self._local.shard
+        except AttributeError:
+            pass
+        shard = self._local.shard = _MetricsShard(len(self.BUCKETS) + 1, self.sample_every)
+        # the thread's locals, and so the token, are dropped when it exits
+        token = self._local.token = _ThreadToken()
+        weakref.finalize(token, _retire_shard, weakref.ref(self), shard)
+        with self._lock:
+            self._shards.append(shard)
+        return shard
+
+    def _retire(self, shard):
+        """Fold an exited thread's shard into the running total."""
+        with self._lock:
+            for index, other in enumerate(self._shards):
+                if other is shard:
+                    del self._shards[index]
+                    break
+            else:
+                # a shard from before a fork: the child started from zero
+                return
+            self._retired.add(shard)
+            self._retired.checkouts += self.sample_every - shard.countdown
+
+    def waited(self, shard, item, seconds):
+        shard.wait_total += seconds
+        shard.waits[bisect_left(self.BUCKETS, seconds)] += 1
+        self.held_since[id(item)] = time.perf_counter()
+
+    def held(self, held):
+        shard = self.shard()
+        shard.hold_total += held
+        shard.holds[bisect_left(self.BUCKETS, held)] += 1
+
+    def snapshot(self):
+        total = _MetricsShard(len(self.BUCKETS) + 1)
+        with self._lock:
+            shards = list(self._shards)
+            total.add(self._retired)
+        for shard in shards:
+            total.add(shard)
+            # checkouts since the shard's last timed one
+            total.checkouts += self.sample_every - shard.countdown
+        bounds = self.BUCKETS + (inf,)
+        # shards count attempts, including those that timed out
+        checkouts = total.checkouts - total.timeouts
+        reuses = checkouts - total.misses
+        return {
+            "checkouts": checkouts,
+            "reuses": reuses,
+            "creations": total.creations,
+            "timeouts": total.timeouts,
+            "hit_rate": reuses / checkouts if checkouts else None,
+            "timed": sum(total.waits),
+            "wait_seconds": total.wait_total,
+            "hold_seconds": total.hold_total,
+            "wait_histogram": dict(zip(bounds, total.waits)),
+            "hold_histogram": dict(zip(bounds, total.holds)),
+        }
+
+
+class _MetricsShard:
+    __slots__ = (
+        "checkouts",
+        "countdown",
+        "misses",
+        "creations",
+        "timeouts",
+        "wait_total",
+        "hold_total",
+        "waits",
+        "holds",
+    )
+
+    def __init__(self, buckets, sample_every=1):
+        # checkouts left until the next timed one
+        self.countdown = sample_every
+        self.checkouts = self.misses = self.creations = self.timeouts = 0
+        self.wait_total = self.hold_total = 0.0
+        self.waits = [0] * buckets
+        self.holds = [0] * buckets
+
+    def add(self, other):
+        for name in ("checkouts", "misses", "creations", "timeouts", "wait_total", "hold_total"):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+        self.waits = [a + b for a, b in zip(self.waits, other.waits)]
+        self.holds = [a + b for a, b in zip(self.holds, other.holds)]
+
+
+# handed to a waiter instead of an object: a discarded object freed a slot,
+# so the waiter may create a new one
+_FREE_SLOT = object()
+
+
+class AsyncObjectPool:
+    """asyncio pool creating objects through factory, never more than max_size.
+
+    factory may be a plain or a coroutine function. Waiting tasks are served
+    first come, first served, and a waiter that is cancelled or times out
+    passes on whatever it was handed, so no object leaks."""
+
+    def __init__(self, factory, max_size):
+        if max_size < 1:
+            raise ValueError("max_size must be at least 1")
+        self.factory = factory
+        self.max_size = max_size
+        self._idle = deque()
+        self._waiters = deque()
+        self._size = 0
+
+    @property
+    def size(self):
+        """Objects created and not discarded, idle or checked out."""
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def acquire(self, timeout=None):
+        """Return a checkout for `async with`, releasing the object on exit."""
+        return AsyncCheckout(self, timeout)
+
+    async def get(self, timeout=None):
+        """Return an idle or new object, waiting in line if none is free.
+
+        Raise PoolExhausted if none is handed over within timeout seconds."""
+        if self._idle:
+            return self._idle.popleft()
+        if self._size < self.max_size:
+            self._size += 1
+            return await self._create()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait({waiter}, timeout=timeout)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        if not waiter.done():
+            self._abandon(waiter)
+            raise PoolExhausted(
+                "all {} objects are checked out; none was released within {}s".format(self.max_size, timeout)
+            )
+        item = waiter.result()
+        return await self._create() if item is _FREE_SLOT else item
+
+    async def _create(self):
+        # the caller has already reserved a slot for the new object
+        try:
+            item = self.factory()
+            if inspect.isawaitable(item):
+                item = await item
+            return item
+        except BaseException:
+            self._forget()
+            raise
+
+    def _abandon(self, waiter):
+        if waiter.done() and not waiter.cancelled():
+            # handed over just before we gave up: pass it on
+            item = waiter.result()
+            if item is _FREE_SLOT:
+                self._forget()
+            else:
+                self.put(item)
+            return
+        waiter.cancel()
+        self._waiters.remove(waiter)
+
+    def _hand_over(self, item):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(item)
+                return True
+        return False
+
+    def put(self, item):
+        if not self._hand_over(item):
+            self._idle.append(item)
+
+    def discard(self, item):
+        """Drop a checked-out object instead of returning it to the pool."""
+        self._forget()
+
+    def _forget(self):
+        if not self._hand_over(_FREE_SLOT):
+            self._size -= 1
+
+
+class AsyncCheckout:
+    """Async counterpart of ObjectPool: `async with` gets an object and puts it back."""
+
+    def __init__(self, pool, timeout=None):
+        self._pool = pool
+        self._timeout = timeout
+        self.item = None
+
+    async def __aenter__(self):
+        if self.item is None:
+            self.item = await self._pool.get(self._timeout)
+        return self.item
+
+    async def __aexit__(self, Type, value, traceback):
+        if self.item is not None:
+            self._pool.put(self.item)
+            self.item = None
+
+
+class BufferPool:
+    """Lends out memoryviews of reusable buffers, sorted into size classes.
+
+    A request for n bytes is served from the smallest power-of-two class
+    of at least n bytes, starting at min_size; the caller gets a
+    memoryview of exactly n bytes. Requests above the largest class
+    (max_size rounded down to a power of two) get a fresh buffer that is
+    not pooled. With arena_size set, each class is first carved out of one
+    preallocated bytearray of that many bytes, and only falls back to
+    separate bytearrays once its arena is used up. Otherwise every buffer
+    is its own bytearray, allocated the first time its class runs dry.
+
+    release() invalidates the view it is given, so using it afterwards
+    raises ValueError rather than scribbling over the next borrower's
+    data. If something still holds a buffer export of the view, the
+    buffer is not reused at all. Buffers are not cleared between
+    borrowers unless zero_on_release is set."""
+
+    def __init__(self, min_size=256, max_size=1 << 20, arena_size=None, zero_on_release=False):
+        if min_size <= 0:
+            raise ValueError("min_size must be positive")
+        self.min_size = 1 << (min_size - 1).bit_length()
+        if self.min_size > max_size:
+            raise ValueError("min_size rounds up to {}, above max_size {}".format(self.min_size, max_size))
+        self.max_size = max_size
+        self.zero_on_release = zero_on_release
+        self._min_bits = self.min_size.bit_length() - 1
+        self._sizes = []
+        size = self.min_size
+        while size <= max_size:
+            self._sizes.append(size)
+            size <<= 1
+        # max_size rounded down to a power of two
+        self._largest = self._sizes[-1]
+        # one list of idle class-sized views per class; single deque
+        # operations are atomic, so lending needs no lock
+        self._free = [deque() for _ in self._sizes]
+        # id(lent view) -> (lent view, class index, class-sized view)
+        self._lent = {}
+        self.nbytes = 0
+        if arena_size is not None:
+            for free, size in zip(self._free, self._sizes):
+                count = arena_size // size
+                arena = memoryview(bytearray(size * count))
+                free.extend(arena[offset:offset + size] for offset in range(0, size * count, size))
+                self.nbytes += size * count
+        self._zeros = bytes(self._largest) if zero_on_release else b""
+
+    def size_class(self, n):
+        """Size of the buffers serving requests for n bytes, None if unpooled."""
+        return None if n > self._largest else self._sizes[self._class_index(n)]
+
+    def _class_index(self, n):
+        return (n - 1).bit_length() - self._min_bits if n > self.min_size else 0
+
+    def acquire(self, n):
+        """Return a writable memoryview of n bytes."""
+        if n < 0:
+            # as bytearray(n) would
+            raise ValueError("negative count")
+        if n > self._largest:
+            return memoryview(bytearray(n))
+        index = self._class_index(n)
+        try:
+            backing = self._free[index].pop()
+        except IndexError:
+            backing = memoryview(bytearray(self._sizes[index]))
+            self.nbytes += len(backing)
+        view = backing[:n]
+        self._lent[id(view)] = (view, index, backing)
+        return view
+
+    def release(self, view):
+        lent = self._lent.pop(id(view), None)
+        if lent is None:
+            # unpooled, or not lent out by this pool
+            return
+        _, index, backing = lent
+        if self.zero_on_release:
+            backing[: len(view)] = self._zeros[: len(view)]
+        try:
+            view.release()
+        except BufferError:
+            # something still holds a buffer export of the view and may
+            # write through it: leave the buffer to it rather than reuse it
+            return
+        self._free[index].append(backing)
+
+    def checkout(self, n):
+        return BufferCheckout(self, n)
+
+
+class BufferCheckout:
+    """BufferPool counterpart of ObjectPool: `with` borrows a buffer and gives it back."""
+
+    def __init__(self, pool, n):
+        self._pool = pool
+        self._n = n
+        self.item = None
+
+    def __enter__(self):
+        if self.item is None:
+            self.item = self._pool.acquire(self._n)
+        return self.item
+
+    def __exit__(self, Type, value, traceback):
+        if self.item is not None:
+            self._pool.release(self.item)
+            self.item = None
+
+
 def main():
     """
     >>> import queue
@@ -77,6 +1101,53 @@ def main():
 
     if not sample_queue.empty():
         print(sample_queue.get())
+
+    >>> created = []
+    >>> def make_connection():
+    ...    created.append('conn{}'.format(len(created)))
+    ...    return created[-1]
+
+    >>> pool = BoundedPool(make_connection, max_size=2, min_idle=1)
+    >>> with pool.checkout() as first, pool.checkout() as second:
+    ...    print(first, second)
+    conn0 conn1
+    >>> with pool.checkout() as conn:
+    ...    print('Reused: {}'.format(conn))
+    Reused: conn1
+
+    >>> with ObjectPool(pool) as a, ObjectPool(pool) as b:
+    ...    try:
+    ...        pool.acquire(timeout=0.01)
+    ...    except PoolExhausted as exc:
+    ...        print(exc)
+    all 2 objects are checked out; none was released within 0.01s
+
+    >>> import asyncio
+    >>> async def open_session():
+    ...    await asyncio.sleep(0)
+    ...    return 'session'
+
+    >>> async def handle(pool, name):
+    ...    async with pool.acquire() as session:
+    ...        await asyncio.sleep(0.01)
+    ...        return '{} used {}'.format(name, session)
+
+    >>> async def serve():
+    ...    pool = AsyncObjectPool(open_session, max_size=1)
+    ...    print(await asyncio.gather(handle(pool, 'a'), handle(pool, 'b')))
+    ...    print('Created: {}'.format(pool.size))
+    >>> asyncio.run(serve())
+    ['a used session', 'b used session']
+    Created: 1
+
+    >>> buffers = BufferPool(min_size=1024, arena_size=1 << 16)
+    >>> with buffers.checkout(600) as buf:
+    ...    buf[:5] = b'hello'
+    ...    print(len(buf), buffers.size_class(600))
+    600 1024
+    >>> with buffers.checkout(1000) as again:
+    ...    print(bytes(again[:5]))
+    b'hello'
     """
 
 
@@ -1,76 +1,1303 @@
+import asyncio
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from collections import OrderedDict, deque
+from collections.abc import Mapping, MutableMapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from heapq import heappop, heappush, merge
+from itertools import count, islice
+from math import inf
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # Python < 3.8: batch_shortest_paths runs its queries in-process
+    shared_memory = None
+
+
+class CSRGraph(Mapping):
+
+    """Read-only adjacency stored in compressed sparse row form.
+
+    Node ids are interned to ints: ``names[i]`` is the id of node ``i`` and
+    the neighbours of ``i`` are ``targets[offsets[i]:offsets[i + 1]]``.
+    Offsets and targets are flat ``array('l')`` buffers, so the per-edge
+    cost is one machine word instead of a Python list slot plus object.
+
+    It behaves as a read-only ``{node: [neighbours]}`` mapping, so it can
+    be handed to GraphSearch in place of the dict form. When built from the
+    weighted ``{node: {neighbour: cost}}`` form the edge costs are kept in a
+    parallel ``array('d')`` and rows read back as dicts."""
+
+    def __init__(self, names, offsets, targets, index=None, weights=None):
+        self.names = names
+        self.index = index if index is not None else {name: i for i, name in enumerate(names)}
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+
+    @classmethod
+    def from_dict(cls, graph):
+        """Build the CSR form of a ``{node: [neighbours]}`` or
+        ``{node: {neighbour: cost}}`` dict.
+
+        Nodes that only appear as neighbours get an empty adjacency row."""
+        names = list(graph)
+        index = {name: i for i, name in enumerate(names)}
+        for neighbours in graph.values():
+            for node in neighbours:
+                if node not in index:
+                    index[node] = len(names)
+                    names.append(node)
+
+        offsets = array("l", [0])
+        targets = array("l")
+        weighted = any(isinstance(neighbours, Mapping) for neighbours in graph.values())
+        weights = array("d") if weighted else None
+        for name in names:
+            neighbours = graph.get(name, ())
+            targets.extend(index[node] for node in neighbours)
+            offsets.append(len(targets))
+            if weighted:
+                if isinstance(neighbours, Mapping):
+                    weights.extend(neighbours.values())
+                else:
+                    weights.extend(1 for _ in neighbours)
+        return cls(names, offsets, targets, index, weights)
+
+    def to_dict(self):
+        return {name: self[name] for name in self.names}
+
+    def neighbour_ids(self, i):
+        return self.targets[self.offsets[i]:self.offsets[i + 1]]
+
+    @property
+    def nbytes(self):
+        """Size of the offsets, targets and weights buffers in bytes."""
+        buffers = (self.offsets, self.targets, self.weights)
+        return sum(len(buf) * buf.itemsize for buf in buffers if buf is not None)
+
+    def save(self, path):
+        """Write the graph in the binary format read by CSRGraph.load.
+
+        Layout, every section padded to 8 bytes and stored in native byte
+        order: a header (magic, version, flags, node and edge counts); the
+        node-name table (int64 values, or int64 offsets into a UTF-8 blob);
+        node ids in name order for lookups; int64 CSR offsets and targets;
+        float64 weights for weighted graphs."""
+        names = list(self.names)
+        if all(isinstance(name, str) for name in names):
+            flags = 0
+        elif all(isinstance(name, int) for name in names):
+            flags = _INT_NAMES
+        else:
+            raise TypeError("only graphs whose node names are all str or all int can be saved")
+        if self.weights is not None:
+            flags |= _WEIGHTED
+        if sys.byteorder == "big":
+            flags |= _BIG_ENDIAN
+
+        with open(path, "wb") as f:
+            f.write(_HEADER.pack(_MAGIC, _VERSION, flags, len(names), len(self.targets)))
+            if flags & _INT_NAMES:
+                _write_section(f, array("q", names))
+            else:
+                encoded = [name.encode("utf-8") for name in names]
+                name_offsets = array("q", [0])
+                for name in encoded:
+                    name_offsets.append(name_offsets[-1] + len(name))
+                _write_section(f, name_offsets)
+                _write_section(f, b"".join(encoded))
+            _write_section(f, array("q", sorted(range(len(names)), key=names.__getitem__)))
+            _write_section(f, array("q", self.offsets))
+            _write_section(f, array("q", self.targets))
+            if self.weights is not None:
+                _write_section(f, array("d", self.weights))
+
+    @classmethod
+    def load(cls, path):
+        """Open a file written by CSRGraph.save without reading it.
+
+        The file is mmap-ed and every section becomes a memoryview onto the
+        mapping, so start-up cost does not depend on the graph size and the
+        pages are shared by every process that maps the same file. Node
+        names are decoded on access and looked up by binary search."""
+        with open(path, "rb") as f:
+            # mmap refuses empty files
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise ValueError("{} is not a graph file".format(path))
+            view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+        magic, version, flags, n_nodes, n_edges = _HEADER.unpack_from(view)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError("{} is not a graph file".format(path))
+        if bool(flags & _BIG_ENDIAN) != (sys.byteorder == "big"):
+            raise ValueError("{} was written on a machine of the other byte order".format(path))
+
+        pos = _HEADER.size
+        if flags & _INT_NAMES:
+            names, pos = _read_section(view, pos, "q", n_nodes, path)
+            key_type = int
+        else:
+            name_offsets, pos = _read_section(view, pos, "q", n_nodes + 1, path)
+            blob, pos = _read_section(view, pos, "B", name_offsets[-1], path)
+            names = _MappedNames(name_offsets, blob)
+            key_type = str
+        sorted_ids, pos = _read_section(view, pos, "q", n_nodes, path)
+        offsets, pos = _read_section(view, pos, "q", n_nodes + 1, path)
+        targets, pos = _read_section(view, pos, "q", n_edges, path)
+        weights = None
+        if flags & _WEIGHTED:
+            weights, pos = _read_section(view, pos, "d", n_edges, path)
+        return cls(names, offsets, targets, _MappedIndex(names, sorted_ids, key_type), weights)
+
+    def __getitem__(self, node):
+        i = self.index[node]
+        names = self.names
+        lo, hi = self.offsets[i], self.offsets[i + 1]
+        if self.weights is not None:
+            return {names[j]: cost for j, cost in zip(self.targets[lo:hi], self.weights[lo:hi])}
+        return [names[j] for j in self.targets[lo:hi]]
+
+    def __contains__(self, node):
+        return node in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+
+_HEADER = struct.Struct("=8sIIqq")
+_MAGIC = b"GRAPHCSR"
+_VERSION = 1
+_WEIGHTED, _INT_NAMES, _BIG_ENDIAN = 1, 2, 4
+
+
+def _write_section(f, data):
+    data = bytes(data)
+    f.write(data)
+    f.write(bytes(-len(data) % 8))
+
+
+def _read_section(view, pos, fmt, length, path):
+    size = length * struct.calcsize(fmt)
+    # a truncated file, or a header with bogus sizes
+    if length < 0 or pos + size > len(view):
+        raise ValueError("{} is not a graph file".format(path))
+    section = view[pos:pos + size].cast(fmt)
+    return section, pos + size + (-size % 8)
+
+
+class _MappedNames(Sequence):
+
+    """Node names decoded on demand from a file's UTF-8 name table."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __getitem__(self, i):
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class _MappedIndex(Mapping):
+
+    """Name -> node id lookups by binary search over ids sorted by name."""
+
+    def __init__(self, names, sorted_ids, key_type):
+        self.names = names
+        self.sorted_ids = sorted_ids
+        self.key_type = key_type
+
+    def __getitem__(self, name):
+        if not isinstance(name, self.key_type):
+            raise KeyError(name)
+        names, sorted_ids = self.names, self.sorted_ids
+        lo, hi = 0, len(sorted_ids)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if names[sorted_ids[mid]] < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(sorted_ids) and names[sorted_ids[lo]] == name:
+            return sorted_ids[lo]
+        raise KeyError(name)
+
+    def __iter__(self):
+        return (self.names[i] for i in self.sorted_ids)
+
+    def __len__(self):
+        return len(self.sorted_ids)
+
+
+class ReachabilityIndex:
+
+    """Answers "can start reach end?", mostly in O(1), after a linear-time build.
+
+    Strongly connected components are condensed into a DAG (iterative
+    Tarjan). Tarjan emits sink components first, so every DAG edge points
+    from a higher component number to a lower one, and that numbering is
+    a post-order of the condensation. Each component c gets the interval
+    [low[c], c], where low[c] is the smallest number it can reach. A
+    component can only reach components whose interval lies inside its
+    own, so most impossible pairs are rejected by comparing two pairs of
+    numbers. When the intervals do nest, a DFS over the condensed DAG
+    settles it, entering only components whose interval still could. The
+    index takes O(V + E) memory: the component map, the intervals and the
+    condensed edges in flat arrays."""
+
+    def __init__(self, graph):
+        begin = time.perf_counter()
+        self.component = {}
+        members = self._strongly_connected_components(graph)
+        component = self.component
+        self.components = len(members)
+        self.low = array("l")
+        self.offsets = array("l", [0])
+        self.successors = array("l")
+        for c, nodes in enumerate(members):
+            targets = set()
+            for node in nodes:
+                for neighbour in graph.get(node, ()):
+                    targets.add(component[neighbour])
+            targets.discard(c)
+            self.low.append(min([c] + [self.low[other] for other in targets]))
+            self.successors.extend(sorted(targets))
+            self.offsets.append(len(self.successors))
+        self.build_seconds = time.perf_counter() - begin
+
+    def _strongly_connected_components(self, graph):
+        nodes = list(graph)
+        nodes.extend(n for neighbours in graph.values() for n in neighbours if n not in graph)
+        index = {}
+        low = {}
+        stack = []
+        on_stack = set()
+        members = []
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [(root, iter(graph.get(root, ())))]
+            while work:
+                node, neighbours = work[-1]
+                for neighbour in neighbours:
+                    if neighbour not in index:
+                        index[neighbour] = low[neighbour] = len(index)
+                        stack.append(neighbour)
+                        on_stack.add(neighbour)
+                        work.append((neighbour, iter(graph.get(neighbour, ()))))
+                        break
+                    if neighbour in on_stack:
+                        low[node] = min(low[node], index[neighbour])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        scc = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            self.component[member] = len(members)
+                            scc.append(member)
+                            if member == node:
+                                break
+                        members.append(scc)
+        return members
+
+    def reachable(self, start, end):
+        if start == end:
+            return True
+        component = self.component
+        if start not in component or end not in component:
+            return False
+        source, target = component[start], component[end]
+        if source == target:
+            return True
+        if target > source or self.low[source] > self.low[target]:
+            return False
+        return self._search(source, target)
+
+    def _search(self, source, target):
+        low, offsets, successors = self.low, self.offsets, self.successors
+        seen = {source}
+        stack = [source]
+        while stack:
+            c = stack.pop()
+            for other in successors[offsets[c]:offsets[c + 1]]:
+                if other == target:
+                    return True
+                # only components whose interval contains target's can reach it
+                if other > target and low[other] <= low[target] and other not in seen:
+                    seen.add(other)
+                    stack.append(other)
+        return False
+
+    @property
+    def nbytes(self):
+        """Approximate memory held by the component map, intervals and DAG edges."""
+        arrays = (self.low, self.offsets, self.successors)
+        return sys.getsizeof(self.component) + sum(len(a) * a.itemsize for a in arrays)
+
+
+class BFSTreeCache:
+
+    """Per-source BFS trees (edge_to, dist_to) kept in LRU order.
+
+    Trees are evicted least recently used first whenever their combined
+    size, as measured by sys.getsizeof of the two dicts, would exceed
+    max_bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._trees = OrderedDict()
+
+    def get(self, source):
+        entry = self._trees.get(source)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._trees.move_to_end(source)
+        return entry[0], entry[1]
+
+    def put(self, source, edge_to, dist_to):
+        self.discard(source)
+        size = sys.getsizeof(edge_to) + sys.getsizeof(dist_to)
+        if size > self.max_bytes:
+            return
+        while self.nbytes + size > self.max_bytes:
+            _, (_, _, evicted) = self._trees.popitem(last=False)
+            self.nbytes -= evicted
+        self._trees[source] = (edge_to, dist_to, size)
+        self.nbytes += size
+
+    def evict(self, stale):
+        """Drop every tree for which stale(edge_to, dist_to) is true."""
+        for source, (edge_to, dist_to, _) in list(self._trees.items()):
+            if stale(edge_to, dist_to):
+                self.discard(source)
+
+    def discard(self, source):
+        entry = self._trees.pop(source, None)
+        if entry is not None:
+            self.nbytes -= entry[2]
+
+    def clear(self):
+        self._trees.clear()
+        self.nbytes = 0
+
+    def __contains__(self, source):
+        return source in self._trees
+
+    def __len__(self):
+        return len(self._trees)
+
+
 class GraphSearch:
 
     """Graph search emulation in python, from source
     http://www.python.org/doc/essays/graphs/
 
     dfs stands for Depth First Search
-    bfs stands for Breadth First Search"""
+    bfs stands for Breadth First Search
+
+    graph is a {node: [neighbours]} dict or any read-only mapping with the
+    same shape, such as CSRGraph. The weighted form {node: {neighbour: cost}}
+    works everywhere too; the unweighted searches just ignore the costs"""
 
     def __init__(self, graph):
         self.graph = graph
+        self.version = 0
+        self.reachability = None
+        self.bfs_cache = None
+        self._reverse = None
+        self._csr = None
+        # (csr, reverse offsets, sources) for pruning searches on a CSRGraph
+        self._csr_reverse = None
+        # whether rows are {neighbour: cost} dicts, found on first mutation
+        self._weighted_rows = None
+
+    # Mutations bump version and keep derived structures in step: the
+    # reverse index is patched in place, cached BFS trees and the
+    # reachability index are only dropped when the change can affect them,
+    # and the CSR copy is rebuilt on next use.
+
+    def add_node(self, node):
+        graph = self._mutable_graph()
+        if node in graph:
+            return
+        graph[node] = {} if self._weighted(graph) else []
+        if self._reverse is not None:
+            self._reverse.setdefault(node, [])
+        # an isolated node reaches nothing, which the index already says
+        self._changed()
+
+    def remove_node(self, node):
+        """Remove node with every edge into or out of it."""
+        graph = self._mutable_graph()
+        if self._reverse is not None:
+            predecessors = set(self._reverse.get(node, ()))
+        else:
+            predecessors = {other for other, neighbours in graph.items() if node in neighbours}
+        if node not in graph and not predecessors:
+            raise KeyError(node)
+
+        for other in predecessors:
+            neighbours = graph[other]
+            if isinstance(neighbours, Mapping):
+                del neighbours[node]
+            else:
+                neighbours[:] = [n for n in neighbours if n != node]
+        successors = graph.pop(node, ())
+        if self._reverse is not None:
+            self._reverse.pop(node, None)
+            for successor in set(successors) - {node}:
+                self._reverse[successor] = [n for n in self._reverse[successor] if n != node]
+
+        self.reachability = None
+        self._evict_trees(lambda edge_to, dist_to: node in dist_to)
+        self._changed()
+
+    def add_edge(self, start, end, cost=None):
+        """Add the edge start -> end (with a cost on weighted graphs).
+
+        Edges of weighted graphs cost 1 unless given a cost; a cost for an
+        unweighted graph raises ValueError. An empty graph becomes weighted
+        if its first edge has a cost."""
+        graph = self._mutable_graph()
+        weighted = self._weighted(graph)
+        if weighted is None:
+            weighted = cost is not None
+        if cost is not None and not weighted:
+            raise ValueError("cannot give edge {!r} -> {!r} a cost on an unweighted graph".format(start, end))
+        neighbours = graph.setdefault(start, {} if weighted else [])
+        if isinstance(neighbours, Mapping):
+            existed = end in neighbours
+            neighbours[end] = 1 if cost is None else cost
+            if existed:
+                # only the cost changed, which nothing derived depends on
+                self._changed()
+                return
+        else:
+            neighbours.append(end)
+        if self._reverse is not None:
+            self._reverse.setdefault(start, [])
+            self._reverse.setdefault(end, []).append(start)
+
+        if self.reachability is not None and not self.reachability.reachable(start, end):
+            self.reachability = None
+        # a tree changes only if start was reached and end could now be
+        # discovered from it; the appended edge is seen after every older one
+        self._evict_trees(lambda edge_to, dist_to: start in dist_to and dist_to.get(end, inf) > dist_to[start])
+        self._changed()
+
+    def remove_edge(self, start, end):
+        """Remove the edge start -> end; KeyError or ValueError if missing."""
+        neighbours = self._mutable_graph()[start]
+        if isinstance(neighbours, Mapping):
+            del neighbours[end]
+        else:
+            neighbours.remove(end)
+        if self._reverse is not None:
+            self._reverse[end].remove(start)
+
+        self.reachability = None
+        # non-tree edges never discovered anything, so only tree edges matter
+        self._evict_trees(lambda edge_to, dist_to: edge_to.get(end) == start)
+        self._changed()
+
+    def _mutable_graph(self):
+        if not isinstance(self.graph, MutableMapping):
+            raise TypeError("{} graphs are read-only".format(type(self.graph).__name__))
+        return self.graph
+
+    def _evict_trees(self, stale):
+        if self.bfs_cache is not None:
+            self.bfs_cache.evict(stale)
+
+    def _weighted(self, graph):
+        # scanning every row costs O(V), so it is done once; None while empty
+        if self._weighted_rows is None and graph:
+            self._weighted_rows = any(isinstance(neighbours, Mapping) for neighbours in graph.values())
+        return self._weighted_rows
+
+    def _changed(self):
+        self.version += 1
+        self._csr = None
+
+    def enable_bfs_cache(self, max_bytes):
+        """Cache whole BFS trees per source so repeated
+        find_shortest_path_bfs calls from it only rebuild the path."""
+        self.bfs_cache = BFSTreeCache(max_bytes)
+        return self.bfs_cache
+
+    def build_reachability_index(self):
+        """Precompute a ReachabilityIndex so that every search rejects
+        unreachable (start, end) pairs without exploring the graph."""
+        self.reachability = ReachabilityIndex(self.graph)
+        return self.reachability
+
+    def _unreachable(self, start, end):
+        return self.reachability is not None and not self.reachability.reachable(start, end)
 
     def find_path_dfs(self, start, end, path=None):
-        path = path or []
+        for found in self._dfs_paths(start, end, path):
+            return list(found)
 
+    def find_all_paths_dfs(self, start, end, path=None, prune=True):
+        return list(self.iter_all_paths_dfs(start, end, path, prune=prune))
+
+    def iter_all_paths_dfs(self, start, end, path=None, *, max_paths=None, max_depth=None, deadline=None, prune=False):
+        """Yield the paths of find_all_paths_dfs one at a time.
+
+        max_paths stops after that many paths, max_depth skips paths with
+        more edges than that, and deadline is a time.monotonic() value after
+        which the search gives up. Memory stays proportional to the depth
+        of the search however many paths there are.
+
+        With prune one reverse BFS from end first finds the nodes that can
+        reach it, and the search never steps anywhere else. That takes
+        memory for the reverse index and the nodes found, so it is off by
+        default here; find_all_paths_dfs turns it on."""
+        allowed = self._nodes_reaching(end, deadline) if prune else None
+        paths = self._dfs_paths(start, end, path, max_depth=max_depth, deadline=deadline, allowed=allowed)
+        for found in islice(paths, max_paths):
+            yield list(found)
+
+    def find_shortest_path_dfs(self, start, end, path=None, prune=True, seed=False):
+        """Shortest path, preferring the first one in DFS order on ties.
+
+        Branch and bound: once a path is found, the search abandons every
+        branch that can no longer beat it. With seed, a BFS first supplies
+        the optimal length, so hopeless branches are cut from the start and
+        the search stops at the first path of that length."""
+        optimum = None
+        if seed and not path:
+            bfs_path = self.find_shortest_path_bfs(start, end)
+            if bfs_path is None:
+                return None
+            optimum = len(bfs_path) - 1
+        allowed = self._nodes_reaching(end) if prune else None
+        search = self._dfs_paths(start, end, path, max_depth=optimum, allowed=allowed)
+
+        # depth counts edges from start, not from the given path prefix
+        offset = len(path or []) + 1
+        shortest = None
+        found = next(search, None)
+        while found is not None:
+            if not shortest or len(found) < len(shortest):
+                shortest = list(found)
+                if len(shortest) - offset == optimum:
+                    break
+            try:
+                found = search.send(len(shortest) - offset - 1)
+            except StopIteration:
+                break
+        return shortest
+
+    def _nodes_reaching(self, end, deadline=None):
+        """Every node with a path to end, by BFS over reverse_graph().
+
+        The reverse index is built once and kept in step by add_edge and
+        the other mutations, so edits made to self.graph directly are not
+        seen; search those with prune=False. Returns None, meaning no
+        pruning, if deadline passes first. Building the index takes
+        O(V + E) that cannot be cut short, so under a deadline only an
+        index built earlier is used."""
+        if isinstance(self.graph, CSRGraph):
+            return self._csr_nodes_reaching(end, deadline)
+        if deadline is not None and self._reverse is None:
+            return None
+        reverse = self.reverse_graph()
+        reaching = {end}
+        queue = deque([end])
+        steps = 0
+        while queue:
+            if deadline is not None:
+                steps += 1
+                if not steps % 1024 and time.monotonic() >= deadline:
+                    return None
+            for node in reverse.get(queue.popleft(), ()):
+                if node not in reaching:
+                    reaching.add(node)
+                    queue.append(node)
+        return reaching
+
+    def _csr_nodes_reaching(self, end, deadline=None):
+        csr = self.graph
+        if end not in csr.index:
+            return {end}
+        if deadline is not None and (self._csr_reverse is None or self._csr_reverse[0] is not csr):
+            return None
+        reverse_offsets, sources = self._csr_reverse_edges(csr)
+        size = len(reverse_offsets) - 1
+        seen = bytearray(size)
+        first = csr.index[end]
+        seen[first] = 1
+        queue = deque([first])
+        steps = 0
+        while queue:
+            if deadline is not None:
+                steps += 1
+                if not steps % 1024 and time.monotonic() >= deadline:
+                    return None
+            value = queue.popleft()
+            for node in sources[reverse_offsets[value]:reverse_offsets[value + 1]]:
+                if not seen[node]:
+                    seen[node] = 1
+                    queue.append(node)
+        return {csr.names[i] for i in range(size) if seen[i]}
+
+    def _csr_reverse_edges(self, csr):
+        # the reversed edges go into flat arrays, not a dict of lists; a
+        # CSRGraph is read-only, so they are built once per graph
+        if self._csr_reverse is not None and self._csr_reverse[0] is csr:
+            return self._csr_reverse[1:]
+        offsets, targets = csr.offsets, csr.targets
+        size = len(offsets) - 1
+        reverse_offsets = array("l", [0]) * (size + 1)
+        for target in targets:
+            reverse_offsets[target + 1] += 1
+        for i in range(size):
+            reverse_offsets[i + 1] += reverse_offsets[i]
+        fill = array("l", reverse_offsets)
+        sources = array("l", [0]) * len(targets)
+        for source in range(size):
+            for target in targets[offsets[source]:offsets[source + 1]]:
+                sources[fill[target]] = source
+                fill[target] += 1
+        self._csr_reverse = (csr, reverse_offsets, sources)
+        return reverse_offsets, sources
+
+    def _dfs_paths(self, start, end, path=None, max_depth=None, deadline=None, allowed=None):
+        """Explicit-stack DFS yielding every simple path from start to end.
+
+        A single path list is extended and truncated in place, so callers
+        must copy what they keep; on_path mirrors it for O(1) cycle checks.
+        Paths come out in the same order as the recursive formulation.
+        When allowed is given, nodes outside it are never entered. Sending
+        a number into the generator lowers max_depth for the rest of the
+        search."""
+        if self._unreachable(start, end):
+            return
+        path = list(path or [])
         path.append(start)
         if start == end:
-            return path
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpath = self.find_path_dfs(node, end, path[:])
-                if newpath:
-                    return newpath
-
-    def find_all_paths_dfs(self, start, end, path=None):
-        path = path or []
-        path.append(start)
-        if start == end:
-            return [path]
-        paths = []
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpaths = self.find_all_paths_dfs(node, end, path[:])
-                paths.extend(newpaths)
-        return paths
-
-    def find_shortest_path_dfs(self, start, end, path=None):
-        path = path or []
-        path.append(start)
+            yield path
+            return
 
+        on_path = set(path)
+        stack = [iter(self.graph.get(start, ()))]
+        steps = 0
+        while stack:
+            # len(stack) is the depth the next neighbour would be at
+            if max_depth is not None and len(stack) > max_depth:
+                stack.pop()
+                on_path.discard(path.pop())
+                continue
+            if deadline is not None:
+                steps += 1
+                if not steps % 1024 and time.monotonic() >= deadline:
+                    return
+            for node in stack[-1]:
+                if node in on_path or (allowed is not None and node not in allowed):
+                    continue
+                path.append(node)
+                if node == end:
+                    limit = yield path
+                    if limit is not None:
+                        max_depth = limit
+                    path.pop()
+                    continue
+                on_path.add(node)
+                stack.append(iter(self.graph.get(node, ())))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+
+    def find_shortest_path_bfs(self, start, end, bidirectional=False):
         if start == end:
-            return path
-        shortest = None
-        for node in self.graph.get(start, []):
-            if node not in path:
-                newpath = self.find_shortest_path_dfs(node, end, path[:])
-                if newpath:
-                    if not shortest or len(newpath) < len(shortest):
-                        shortest = newpath
-        return shortest
+            return [start]
+        if self._unreachable(start, end):
+            return None
+        if bidirectional:
+            return self._find_shortest_path_bidirectional(start, end)
+        if self.bfs_cache is not None:
+            tree = self.bfs_cache.get(start)
+            if tree is None:
+                tree = self._bfs_tree(start)
+                self.bfs_cache.put(start, *tree)
+            edge_to, dist_to = tree
+            if end not in dist_to:
+                return None
+            return self._walk_back(edge_to, start, end)
 
-    def find_shortest_path_bfs(self, start, end):
-        queue = [start]
+        queue = deque([start])
         dist_to = {start: 0}
         edge_to = {}
 
+        while queue:
+            value = queue.popleft()
+            for node in self.graph.get(value, ()):
+                if node not in dist_to:
+                    edge_to[node] = value
+                    dist_to[node] = dist_to[value] + 1
+                    queue.append(node)
+                    if node == end:
+                        return self._walk_back(edge_to, start, end)
+
+    def bfs_layers(self, start, max_nodes=None, edge_to=None):
+        """Yield the BFS frontier from start one layer at a time.
+
+        Layer k is the list of nodes at distance k, in the order
+        find_shortest_path_bfs discovers them. Once max_nodes nodes have
+        been discovered the current layer is yielded as it stands and the
+        traversal stops. Pass a dict as edge_to to receive the BFS parent
+        of every yielded node."""
+        edge_to = {} if edge_to is None else edge_to
+        return self._bfs_layers(start, {}, edge_to, max_nodes)
+
+    def _bfs_layers(self, start, dist_to, edge_to, max_nodes=None):
+        if max_nodes is not None and max_nodes < 1:
+            return
+        dist_to[start] = 0
+        discovered = 1
+        layer = [start]
+        while layer:
+            yield layer
+            if discovered == max_nodes:
+                return
+            next_layer = []
+            for value in layer:
+                for node in self.graph.get(value, ()):
+                    if node not in dist_to:
+                        edge_to[node] = value
+                        dist_to[node] = dist_to[value] + 1
+                        next_layer.append(node)
+                        discovered += 1
+                        if discovered == max_nodes:
+                            yield next_layer
+                            return
+            layer = next_layer
+
+    def _bfs_tree(self, start):
+        """Run BFS from start to exhaustion; return (edge_to, dist_to)."""
+        dist_to = {}
+        edge_to = {}
+        for _ in self._bfs_layers(start, dist_to, edge_to):
+            pass
+        return edge_to, dist_to
+
+    def as_csr(self):
+        """The graph as a CSRGraph, converted once and cached."""
+        if isinstance(self.graph, CSRGraph):
+            return self.graph
+        if self._csr is None:
+            self._csr = CSRGraph.from_dict(self.graph)
+        return self._csr
+
+    def bfs_distances(self, start):
+        """Level-synchronous BFS from start over the whole graph.
+
+        Returns (dist, parent) arrays indexed by CSRGraph node id, with -1
+        for unreached nodes (and for the parent of start). With NumPy
+        installed each layer is expanded by a handful of array operations
+        and NumPy arrays are returned; otherwise the layers are expanded in
+        Python and array('l') is returned. Parents are the ones
+        find_shortest_path_bfs would pick."""
+        csr = self.as_csr()
+        source = csr.index[start]
+        if np is None:
+            return self._bfs_distances_python(csr, source)
+
+        offsets = np.frombuffer(csr.offsets, dtype=memoryview(csr.offsets).format)
+        targets = np.frombuffer(csr.targets, dtype=memoryview(csr.targets).format)
+        dist = np.full(len(csr), -1, dtype=np.int64)
+        parent = np.full(len(csr), -1, dtype=np.int64)
+        dist[source] = 0
+        frontier = np.array([source], dtype=np.int64)
+        level = 0
+        while frontier.size:
+            starts = offsets[frontier]
+            counts = offsets[frontier + 1] - starts
+            total = int(counts.sum())
+            if not total:
+                break
+            # every edge leaving the frontier, in frontier then row order
+            owners = np.repeat(frontier, counts)
+            ranks = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            neighbours = targets[np.repeat(starts, counts) + ranks]
+            fresh = dist[neighbours] == -1
+            neighbours, owners = neighbours[fresh], owners[fresh]
+            # keep the first discovery of each node, in discovery order
+            _, first = np.unique(neighbours, return_index=True)
+            first.sort()
+            frontier = neighbours[first]
+            level += 1
+            dist[frontier] = level
+            parent[frontier] = owners[first]
+        return dist, parent
+
+    @staticmethod
+    def _bfs_distances_python(csr, source):
+        offsets, targets = csr.offsets, csr.targets
+        dist = array("l", [-1]) * len(csr)
+        parent = array("l", [-1]) * len(csr)
+        dist[source] = 0
+        frontier = [source]
+        level = 0
+        while frontier:
+            level += 1
+            layer = []
+            for value in frontier:
+                for node in targets[offsets[value]:offsets[value + 1]]:
+                    if dist[node] == -1:
+                        dist[node] = level
+                        parent[node] = value
+                        layer.append(node)
+            frontier = layer
+        return dist, parent
+
+    def path_from_parents(self, parent, start, end):
+        """Rebuild the start -> end path from a bfs_distances parent array.
+
+        None if the walk back from end never passes start, as when the
+        array was built from another source and start is not on its path."""
+        csr = self.as_csr()
         if start == end:
-            return queue
+            return [start]
+        first, node = csr.index.get(start), csr.index.get(end)
+        if first is None or node is None:
+            return None
+        path = [node]
+        while node != first:
+            node = int(parent[node])
+            if node == -1:
+                return None
+            path.append(node)
+        path.reverse()
+        return [csr.names[i] for i in path]
+
+    def external_bfs(self, start, out_path, run_records=1 << 20, work_dir=None, fan_in=64):
+        """Out-of-core BFS from start for graphs opened with CSRGraph.load.
+
+        Adjacency is read from the memory-mapped CSR arrays, while the
+        frontier and the visited set live in sorted files under work_dir:
+        the neighbours of each layer are spilled to sorted runs of at most
+        run_records (node, parent) records, merged, and subtracted from
+        the visited file by a merge join. Runs are merged at most fan_in
+        at a time, in several passes if there are more, so RAM use (and
+        the number of open files) is bounded by run_records and fan_in
+        whatever the size of the graph.
+
+        Writes one (node, distance, parent) record per reached node, as CSR
+        ids, to out_path (see read_bfs_records) and returns how many there
+        are. The parent is the lowest-id node of the previous layer with an
+        edge to the node; the start node has parent -1."""
+        if fan_in < 2:
+            raise ValueError("fan_in must be at least 2")
+        csr = self.as_csr()
+        offsets, targets = csr.offsets, csr.targets
+        source = csr.index[start]
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+            visited = os.path.join(tmp, "visited")
+            frontier = os.path.join(tmp, "frontier")
+            with _RecordWriter(visited, _ID_RECORD) as writer:
+                writer.write(source)
+            with _RecordWriter(frontier, _EDGE_RECORD) as writer:
+                writer.write(source, -1)
+
+            with _RecordWriter(out_path, _BFS_RECORD) as out:
+                out.write(source, 0, -1)
+                reached = 1
+                depth = 0
+                while True:
+                    depth += 1
+                    # neighbours of the frontier as sorted (node, parent) runs
+                    runs = []
+                    buffer = []
+                    for node, _ in _read_records(frontier, _EDGE_RECORD):
+                        for neighbour in targets[offsets[node]:offsets[node + 1]]:
+                            buffer.append((neighbour, node))
+                            if len(buffer) >= run_records:
+                                runs.append(_write_run(tmp, len(runs), buffer))
+                                buffer = []
+                    if buffer:
+                        runs.append(_write_run(tmp, len(runs), buffer))
+
+                    # keep the first record of every node not visited yet
+                    next_frontier = os.path.join(tmp, "frontier.next")
+                    runs = _merge_runs(tmp, runs, fan_in)
+                    merged = merge(*(_read_records(run, _EDGE_RECORD) for run in runs))
+                    old = _read_records(visited, _ID_RECORD)
+                    seen = next(old, None)
+                    last = None
+                    found = 0
+                    with _RecordWriter(next_frontier, _EDGE_RECORD) as writer:
+                        for node, parent in merged:
+                            if node == last:
+                                continue
+                            last = node
+                            while seen is not None and seen[0] < node:
+                                seen = next(old, None)
+                            if seen is not None and seen[0] == node:
+                                continue
+                            writer.write(node, parent)
+                            out.write(node, depth, parent)
+                            found += 1
+                    for run in runs:
+                        os.remove(run)
+                    os.replace(next_frontier, frontier)
+                    if not found:
+                        return reached
+                    reached += found
+
+                    next_visited = os.path.join(tmp, "visited.next")
+                    layer = ((node,) for node, _ in _read_records(frontier, _EDGE_RECORD))
+                    with _RecordWriter(next_visited, _ID_RECORD) as writer:
+                        for (node,) in merge(_read_records(visited, _ID_RECORD), layer):
+                            writer.write(node)
+                    os.replace(next_visited, visited)
+
+    @staticmethod
+    def read_bfs_records(path):
+        """Stream the (node, distance, parent) records written by external_bfs."""
+        return _read_records(path, _BFS_RECORD)
+
+    def find_shortest_path_dijkstra(self, start, end):
+        """Cheapest path by total edge cost, as a (path, cost) pair.
 
-        while len(queue):
-            value = queue.pop(0)
-            for node in self.graph[value]:
-                if node not in dist_to.keys():
+        Edges without a cost (the list form) count as 1."""
+        return self.find_shortest_path_astar(start, end, None)
+
+    def find_shortest_path_astar(self, start, end, heuristic):
+        """Like find_shortest_path_dijkstra, but guided by heuristic(node), an
+        estimate of the remaining cost to end that must never overestimate it."""
+        if self._unreachable(start, end):
+            return None
+        if heuristic is None:
+            heuristic = lambda node: 0
+        dist_to = {start: 0}
+        edge_to = {}
+        # the counter breaks ties so nodes themselves never get compared
+        tie = count()
+        heap = [(heuristic(start), next(tie), 0, start)]
+
+        while heap:
+            _, _, cost, value = heappop(heap)
+            if cost > dist_to[value]:
+                continue
+            if value == end:
+                return self._walk_back(edge_to, start, end), cost
+            for node, weight in self._edges(value):
+                new_cost = cost + weight
+                if node not in dist_to or new_cost < dist_to[node]:
+                    dist_to[node] = new_cost
+                    edge_to[node] = value
+                    heappush(heap, (new_cost + heuristic(node), next(tie), new_cost, node))
+
+    def _edges(self, node):
+        neighbours = self.graph.get(node, ())
+        if isinstance(neighbours, Mapping):
+            return neighbours.items()
+        return ((neighbour, 1) for neighbour in neighbours)
+
+    def reverse_graph(self):
+        """Predecessor lists of every node, built on first use."""
+        if self._reverse is None:
+            reverse = {}
+            for node, neighbours in self.graph.items():
+                reverse.setdefault(node, [])
+                for neighbour in neighbours:
+                    reverse.setdefault(neighbour, []).append(node)
+            self._reverse = reverse
+        return self._reverse
+
+    def _find_shortest_path_bidirectional(self, start, end):
+        """Grow BFS layers from both ends, always expanding the smaller
+        frontier, until they meet."""
+        reverse = self.reverse_graph()
+        forward, backward = [start], [end]
+        forward_dist, backward_dist = {start: 0}, {end: 0}
+        forward_edge, backward_edge = {}, {}
+
+        while forward and backward:
+            if len(forward) <= len(backward):
+                forward, meet = self._expand_layer(forward, self.graph, forward_dist, forward_edge, backward_dist)
+            else:
+                backward, meet = self._expand_layer(backward, reverse, backward_dist, backward_edge, forward_dist)
+            if meet is not None:
+                path = self._walk_back(forward_edge, start, meet)
+                node = meet
+                while node != end:
+                    node = backward_edge[node]
+                    path.append(node)
+                return path
+
+    @staticmethod
+    def _expand_layer(frontier, adjacency, dist_to, edge_to, other_dist):
+        """Expand one whole BFS layer; return the next layer and the node
+        joining both searches on the shortest combined distance, if any."""
+        layer = []
+        meet = None
+        best = None
+        for value in frontier:
+            for node in adjacency.get(value, ()):
+                if node not in dist_to:
                     edge_to[node] = value
                     dist_to[node] = dist_to[value] + 1
-                    queue.append(node)
-                    if end in edge_to.keys():
-                        path = []
-                        node = end
-                        while dist_to[node] != 0:
-                            path.insert(0, node)
-                            node = edge_to[node]
-                        path.insert(0, start)
-                        return path
+                    layer.append(node)
+                    if node in other_dist:
+                        total = dist_to[node] + other_dist[node]
+                        if best is None or total < best:
+                            best, meet = total, node
+        return layer, meet
+
+    @staticmethod
+    def _walk_back(edge_to, start, end):
+        path = [end]
+        node = end
+        while node != start:
+            node = edge_to[node]
+            path.append(node)
+        path.reverse()
+        return path
+
+    def batch_shortest_paths(self, pairs, workers=None):
+        """find_shortest_path_bfs for every (start, end) in pairs, fanned out
+        over a pool of worker processes. Results keep the input order.
+
+        The graph is copied once into shared memory as flat CSR offsets and
+        targets; workers attach to it when they start, so tasks only carry
+        a pair of node ids and return a list of ids. Without
+        multiprocessing.shared_memory (before Python 3.8) the queries run
+        in this process."""
+        pairs = list(pairs)
+        if not workers or workers <= 1 or shared_memory is None:
+            return [self.find_shortest_path_bfs(start, end) for start, end in pairs]
+
+        csr = self.as_csr()
+        results = [None] * len(pairs)
+        queries, slots = [], []
+        for slot, (start, end) in enumerate(pairs):
+            if start == end:
+                results[slot] = [start]
+            elif start in csr.index and end in csr.index and not self._unreachable(start, end):
+                queries.append((csr.index[start], csr.index[end]))
+                slots.append(slot)
+
+        blocks = [_share_array(csr.offsets), _share_array(csr.targets)]
+        try:
+            buffers = (memoryview(csr.offsets), memoryview(csr.targets))
+            shared = [(block.name, buf.format, len(buf)) for block, buf in zip(blocks, buffers)]
+            chunksize = max(1, len(queries) // (workers * 4))
+            with ProcessPoolExecutor(workers, initializer=_attach_shared_csr, initargs=(shared,)) as pool:
+                for slot, ids in zip(slots, pool.map(_shared_csr_path, queries, chunksize=chunksize)):
+                    if ids is not None:
+                        results[slot] = [csr.names[i] for i in ids]
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        return results
+
+
+_ID_RECORD = struct.Struct("=q")
+_EDGE_RECORD = struct.Struct("=qq")
+_BFS_RECORD = struct.Struct("=qqq")
+
+
+class _RecordWriter:
+
+    """Buffered writer of fixed-size binary records."""
+
+    def __init__(self, path, record):
+        self.file = open(path, "wb")
+        self.record = record
+        self.buffer = bytearray()
+
+    def write(self, *values):
+        self.buffer += self.record.pack(*values)
+        if len(self.buffer) >= 1 << 16:
+            self.file.write(self.buffer)
+            self.buffer.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.file.write(self.buffer)
+        self.file.close()
+
+
+def _read_records(path, record):
+    with open(path, "rb") as f:
+        while True:
+            chunk = f.read(record.size * 4096)
+            if not chunk:
+                return
+            yield from record.iter_unpack(chunk)
+
+
+def _write_run(directory, number, records):
+    records.sort()
+    path = os.path.join(directory, "run{}".format(number))
+    with _RecordWriter(path, _EDGE_RECORD) as writer:
+        for record in records:
+            writer.write(*record)
+    return path
+
+
+def _merge_runs(directory, runs, fan_in):
+    """Merge sorted runs fan_in at a time until at most fan_in are left."""
+    number = len(runs)
+    while len(runs) > fan_in:
+        merged = []
+        for first in range(0, len(runs), fan_in):
+            group = runs[first:first + fan_in]
+            if len(group) == 1:
+                merged.append(group[0])
+                continue
+            path = os.path.join(directory, "run{}".format(number))
+            number += 1
+            with _RecordWriter(path, _EDGE_RECORD) as writer:
+                for record in merge(*(_read_records(run, _EDGE_RECORD) for run in group)):
+                    writer.write(*record)
+            for run in group:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+    return runs
+
+
+def _share_array(values):
+    """Copy an array or memoryview into a new shared memory block."""
+    size = len(values) * values.itemsize
+    block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+    block.buf[:size] = memoryview(values).cast("B")
+    return block
+
+
+# CSR arrays attached by each batch_shortest_paths worker process
+_shared_csr = []
+
+
+def _attach_shared_csr(shared):
+    for name, typecode, length in shared:
+        block = shared_memory.SharedMemory(name=name)
+        _shared_csr.append((block, block.buf.cast(typecode)[:length]))
+
+
+def _shared_csr_path(ids):
+    (_, offsets), (_, targets) = _shared_csr
+    return _csr_bfs_path(offsets, targets, *ids)
+
+
+def _csr_bfs_path(offsets, targets, start, end):
+    """find_shortest_path_bfs over raw CSR node ids."""
+    queue = deque([start])
+    edge_to = {start: start}
+    while queue:
+        value = queue.popleft()
+        for node in targets[offsets[value]:offsets[value + 1]]:
+            if node not in edge_to:
+                edge_to[node] = value
+                if node == end:
+                    return GraphSearch._walk_back(edge_to, start, end)
+                queue.append(node)
+
+
+class AsyncGraphSearch:
+
+    """Breadth-first searches over adjacency served by an async provider.
+
+    neighbours is a coroutine function taking a list of nodes and returning
+    a {node: [neighbours]} mapping for them; nodes it leaves out have no
+    neighbours. Fetches are batched across a whole BFS frontier, at most
+    max_in_flight batches are awaited at once, and every fetched adjacency
+    list is cached, so a search costs one round of requests per BFS layer
+    rather than one request per node."""
+
+    def __init__(self, neighbours, batch_size=128, max_in_flight=8):
+        self.neighbours = neighbours
+        self.batch_size = batch_size
+        self.max_in_flight = max_in_flight
+        self.cache = {}
+        self.requests = 0
+
+    async def prefetch(self, nodes):
+        """Fetch and cache the neighbours of every node not cached yet."""
+        missing = [node for node in dict.fromkeys(nodes) if node not in self.cache]
+        if not missing:
+            return
+        # made per call: a semaphore belongs to the loop it is first used on
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        await asyncio.gather(*(self._fetch(batch, in_flight) for batch in batches))
+
+    async def _fetch(self, batch, in_flight):
+        async with in_flight:
+            self.requests += 1
+            fetched = await self.neighbours(batch)
+        for node in batch:
+            self.cache[node] = list(fetched.get(node, ()))
+
+    async def bfs_layers(self, start, max_nodes=None, edge_to=None):
+        """Async counterpart of GraphSearch.bfs_layers."""
+        edge_to = {} if edge_to is None else edge_to
+        if max_nodes is not None and max_nodes < 1:
+            return
+        seen = {start}
+        layer = [start]
+        while layer:
+            yield layer
+            if len(seen) == max_nodes:
+                return
+            await self.prefetch(layer)
+            next_layer = []
+            for value in layer:
+                for node in self.cache[value]:
+                    if node not in seen:
+                        seen.add(node)
+                        edge_to[node] = value
+                        next_layer.append(node)
+                        if len(seen) == max_nodes:
+                            yield next_layer
+                            return
+            layer = next_layer
+
+    async def find_shortest_path_bfs(self, start, end):
+        """Same path as GraphSearch.find_shortest_path_bfs."""
+        if start == end:
+            return [start]
+        edge_to = {}
+        async for _ in self.bfs_layers(start, edge_to=edge_to):
+            if end in edge_to:
+                return GraphSearch._walk_back(edge_to, start, end)
 
 
 def main():
@@ -107,6 +1334,9 @@ def main():
 
     >>> print(graph_search.find_all_paths_dfs('A', 'D'))
     [['A', 'B', 'C', 'D'], ['A', 'B', 'D'], ['A', 'C', 'D']]
+    >>> paths = graph_search.iter_all_paths_dfs('A', 'D', max_depth=2)
+    >>> print(next(paths))
+    ['A', 'B', 'D']
     >>> print(graph_search.find_shortest_path_dfs('A', 'D'))
     ['A', 'B', 'D']
     >>> print(graph_search.find_shortest_path_dfs('A', 'F'))
@@ -128,6 +1358,96 @@ def main():
     # non existing node
     >>> print(graph_search.find_shortest_path_bfs('A', 'X'))
     None
+
+    # search from both ends at once over a reverse index built on demand
+    >>> print(graph_search.find_shortest_path_bfs('A', 'F', bidirectional=True))
+    ['A', 'C', 'G', 'E', 'F']
+    >>> print(graph_search.find_shortest_path_bfs('A', 'H', bidirectional=True))
+    None
+
+    # with a reachability index impossible queries fail without searching
+    >>> index = graph_search.build_reachability_index()
+    >>> index.reachable('C', 'H'), index.reachable('H', 'E')
+    (False, True)
+    >>> print(graph_search.find_path_dfs('C', 'H'))
+    None
+    >>> print(graph_search.find_shortest_path_bfs('A', 'F'))
+    ['A', 'C', 'G', 'E', 'F']
+
+    # cache BFS trees so further queries from 'A' skip the traversal;
+    # changing the graph through the mutation API invalidates them
+    >>> cache = graph_search.enable_bfs_cache(max_bytes=2 ** 20)
+    >>> print(graph_search.find_shortest_path_bfs('A', 'G'))
+    ['A', 'C', 'G']
+    >>> print(graph_search.find_shortest_path_bfs('A', 'E'), cache.hits)
+    ['A', 'C', 'G', 'E'] 1
+    >>> graph_search.add_edge('A', 'E')
+    >>> print(graph_search.find_shortest_path_bfs('A', 'E'), graph_search.version)
+    ['A', 'E'] 1
+    >>> graph_search.remove_edge('A', 'E')
+
+    # stream the traversal layer by layer, stopping after a node budget
+    >>> for layer in graph_search.bfs_layers('A'):
+    ...     print(layer)
+    ['A']
+    ['B', 'C']
+    ['D', 'G']
+    ['E']
+    ['F']
+    >>> print(list(graph_search.bfs_layers('A', max_nodes=4)))
+    [['A'], ['B', 'C'], ['D']]
+
+    # the same search against a slow remote adjacency service, fetching
+    # whole frontiers at a time
+    >>> import asyncio
+    >>> async def remote_neighbours(nodes):
+    ...     await asyncio.sleep(0.01)
+    ...     return {node: graph.get(node, []) for node in nodes}
+    >>> remote_search = AsyncGraphSearch(remote_neighbours)
+    >>> print(asyncio.run(remote_search.find_shortest_path_bfs('A', 'F')))
+    ['A', 'C', 'G', 'E', 'F']
+    >>> remote_search.requests
+    4
+
+    # distances and BFS parents of every node at once, indexed by CSR id
+    >>> dist, parent = graph_search.bfs_distances('A')
+    >>> print(graph_search.path_from_parents(parent, 'A', 'F'))
+    ['A', 'C', 'G', 'E', 'F']
+    >>> print(graph_search.path_from_parents(parent, 'A', 'H'))
+    None
+
+    # the same searches over the compact CSR form
+    >>> csr_search = GraphSearch(CSRGraph.from_dict(graph))
+    >>> print(csr_search.find_path_dfs('A', 'D'))
+    ['A', 'B', 'C', 'D']
+    >>> print(csr_search.find_all_paths_dfs('A', 'D'))
+    [['A', 'B', 'C', 'D'], ['A', 'B', 'D'], ['A', 'C', 'D']]
+    >>> print(csr_search.find_shortest_path_dfs('A', 'F'))
+    ['A', 'C', 'G', 'E', 'F']
+    >>> print(csr_search.find_shortest_path_bfs('A', 'F'))
+    ['A', 'C', 'G', 'E', 'F']
+    >>> csr_search.graph.to_dict() == graph
+    True
+
+    # weighted graphs map each neighbour to the cost of reaching it
+    >>> roads = {
+    ...     'A': {'B': 7, 'C': 2},
+    ...     'B': {'D': 1},
+    ...     'C': {'B': 3, 'D': 8},
+    ...     'D': {},
+    ... }
+    >>> road_search = GraphSearch(roads)
+    >>> print(road_search.find_shortest_path_bfs('A', 'D'))
+    ['A', 'B', 'D']
+    >>> print(road_search.find_shortest_path_dijkstra('A', 'D'))
+    (['A', 'C', 'B', 'D'], 6)
+
+    # A* with an admissible estimate of the remaining cost
+    >>> estimate = {'A': 5, 'B': 1, 'C': 4, 'D': 0}
+    >>> print(road_search.find_shortest_path_astar('A', 'D', estimate.get))
+    (['A', 'C', 'B', 'D'], 6)
+    >>> print(road_search.find_shortest_path_dijkstra('D', 'A'))
+    None
     """
 
 
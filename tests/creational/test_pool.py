@@ -1,7 +1,20 @@
+import asyncio
+import os
+import pickle
 import queue
+import threading
+import time
 import unittest
 
-from patterns.creational.pool import ObjectPool
+from patterns.creational.pool import (
+    AsyncObjectPool,
+    BoundedPool,
+    BufferPool,
+    ObjectPool,
+    PoolExhausted,
+    PoolMetrics,
+    ThreadCachedPool,
+)
 
 
 class TestPool(unittest.TestCase):
@@ -49,3 +62,754 @@ class TestNaitivePool(unittest.TestCase):
     # print('Outside func: {}'.format(sample_queue.get()))
 
     # if not sample_queue.empty():
+
+
+class Counter:
+    def __init__(self):
+        self.created = 0
+
+    def __call__(self):
+        self.created += 1
+        return "obj{}".format(self.created)
+
+
+class TestBoundedPool(unittest.TestCase):
+    def test_objects_are_created_lazily_up_to_max_size(self):
+        factory = Counter()
+        pool = BoundedPool(factory, max_size=2)
+        self.assertEqual(factory.created, 0)
+        first = pool.acquire()
+        second = pool.acquire()
+        self.assertEqual((first, second), ("obj1", "obj2"))
+        self.assertEqual(pool.size, 2)
+        pool.release(first)
+        self.assertEqual(pool.acquire(), "obj1")
+        self.assertEqual(factory.created, 2)
+
+    def test_min_idle_prewarms(self):
+        factory = Counter()
+        pool = BoundedPool(factory, max_size=5, min_idle=3)
+        self.assertEqual((factory.created, pool.idle, pool.size), (3, 3, 3))
+        with self.assertRaises(ValueError):
+            BoundedPool(factory, max_size=1, min_idle=2)
+
+    def test_exhausted_pool_times_out(self):
+        pool = BoundedPool(Counter(), max_size=1)
+        pool.acquire()
+        with self.assertRaises(PoolExhausted):
+            pool.acquire(timeout=0.01)
+        # PoolExhausted is a queue.Empty, like a timed out Queue.get
+        with self.assertRaises(queue.Empty):
+            pool.get(block=False)
+
+    def test_waiter_gets_released_object(self):
+        pool = BoundedPool(Counter(), max_size=1)
+        item = pool.acquire()
+        threading.Timer(0.05, pool.release, [item]).start()
+        self.assertEqual(pool.acquire(timeout=5), item)
+
+    def test_failing_factory_frees_its_slot(self):
+        def factory():
+            raise RuntimeError("cannot connect")
+
+        pool = BoundedPool(factory, max_size=1)
+        with self.assertRaises(RuntimeError):
+            pool.acquire()
+        self.assertEqual(pool.size, 0)
+
+    def test_discard_frees_a_slot(self):
+        pool = BoundedPool(Counter(), max_size=1)
+        pool.discard(pool.acquire())
+        self.assertEqual(pool.acquire(timeout=0), "obj2")
+
+    def test_context_manager_checkout(self):
+        pool = BoundedPool(Counter(), max_size=1)
+        with pool.checkout() as obj:
+            self.assertEqual(obj, "obj1")
+            self.assertEqual(pool.idle, 0)
+        self.assertEqual(pool.idle, 1)
+        with ObjectPool(pool, timeout=1) as obj:
+            self.assertEqual(obj, "obj1")
+            with self.assertRaises(PoolExhausted):
+                with pool.checkout(timeout=0.01):
+                    pass
+        self.assertEqual(pool.idle, 1)
+
+
+class Handle:
+    def __init__(self):
+        self.healthy = True
+        self.dirty = False
+        self.closed = False
+
+
+class TestPoolHealth(unittest.TestCase):
+    def test_invalid_objects_are_replaced_on_checkout(self):
+        closed = []
+        pool = BoundedPool(Handle, max_size=2, validate=lambda h: h.healthy, close=closed.append)
+        first = pool.acquire()
+        pool.release(first)
+        first.healthy = False
+        second = pool.acquire()
+        self.assertIsNot(second, first)
+        self.assertEqual(closed, [first])
+        self.assertEqual(pool.size, 1)
+
+    def test_raising_validate_counts_as_invalid(self):
+        def validate(handle):
+            raise OSError("connection reset")
+
+        pool = BoundedPool(Handle, max_size=1, min_idle=1, validate=validate)
+        self.assertIsInstance(pool.acquire(timeout=0), Handle)
+        self.assertEqual(pool.size, 1)
+
+    def test_reset_on_return(self):
+        def reset(handle):
+            handle.dirty = False
+
+        pool = BoundedPool(Handle, max_size=1, reset=reset)
+        with pool.checkout() as handle:
+            handle.dirty = True
+        self.assertFalse(handle.dirty)
+        # reset returning False drops the object
+        pool = BoundedPool(Handle, max_size=1, reset=lambda handle: False)
+        pool.release(pool.acquire())
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+
+    def test_max_lifetime(self):
+        pool = BoundedPool(Handle, max_size=1, max_lifetime=0.05, reap_interval=3600)
+        old = pool.acquire()
+        time.sleep(0.06)
+        pool.release(old)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(), old)
+
+    def test_reap_shrinks_to_min_idle(self):
+        pool = BoundedPool(Handle, max_size=5, min_idle=2, idle_ttl=0.05, reap_interval=3600)
+        handles = [pool.acquire() for _ in range(5)]
+        for handle in handles:
+            pool.release(handle)
+        self.assertEqual(pool.reap(), 0)
+        time.sleep(0.06)
+        self.assertEqual(pool.reap(), 3)
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        pool.shutdown()
+
+    def test_reap_replaces_expired_objects_up_to_min_idle(self):
+        pool = BoundedPool(Handle, max_size=2, min_idle=2, max_lifetime=0.05, reap_interval=3600)
+        before = list(pool._idle)
+        time.sleep(0.06)
+        self.assertEqual(pool.reap(), 2)
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        self.assertFalse(set(map(id, before)) & set(map(id, pool._idle)))
+        pool.shutdown()
+
+    def test_reaper_thread(self):
+        pool = BoundedPool(Handle, max_size=3, idle_ttl=0.02, reap_interval=0.01)
+        handles = [pool.acquire() for _ in range(3)]
+        for handle in handles:
+            pool.release(handle)
+        deadline = time.monotonic() + 5
+        while pool.size and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.shutdown()
+        self.assertEqual(pool.size, 0)
+
+    def test_reaper_survives_errors(self):
+        failures = []
+
+        def connect():
+            if failures:
+                raise ConnectionError(failures.pop())
+            return Handle()
+
+        pool = BoundedPool(connect, max_size=2, min_idle=2, idle_ttl=3600, reap_interval=0.01)
+        failures.append("refused")
+        with self.assertLogs("patterns.creational.pool", "ERROR"):
+            pool.discard(pool.acquire())
+            deadline = time.monotonic() + 5
+            while (failures or pool.idle < 2) and time.monotonic() < deadline:
+                time.sleep(0.01)
+        pool.shutdown()
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+
+    def test_failing_close_is_logged(self):
+        def close(handle):
+            raise OSError("already closed")
+
+        pool = BoundedPool(Handle, max_size=3, min_idle=3, close=close, max_lifetime=0.05, reap_interval=3600)
+        time.sleep(0.06)
+        with self.assertLogs("patterns.creational.pool", "ERROR"):
+            self.assertEqual(pool.reap(), 3)
+        self.assertEqual((pool.size, pool.idle), (3, 3))
+        pool.shutdown()
+        # a broken object is replaced on checkout and dropped on return
+        pool = BoundedPool(Handle, max_size=1, min_idle=1, validate=lambda h: h.healthy, close=close)
+        pool._idle[0].healthy = False
+        with self.assertLogs("patterns.creational.pool", "ERROR"):
+            handle = pool.acquire(timeout=0)
+            handle.healthy = False
+            pool.discard(handle)
+        self.assertEqual(pool.size, 0)
+
+    def test_validate_returning_none_keeps_the_object(self):
+        factory = Counter()
+        pool = BoundedPool(factory, max_size=1, validate=lambda item: None)
+        for _ in range(3):
+            pool.release(pool.acquire())
+        self.assertEqual(factory.created, 1)
+
+    def test_thread_cached_pool_validates(self):
+        pool = ThreadCachedPool(Handle, max_size=2, validate=lambda h: h.healthy)
+        handle = pool.acquire()
+        pool.release(handle)
+        handle.healthy = False
+        self.assertIsNot(pool.acquire(), handle)
+        self.assertEqual(pool.size, 1)
+
+
+class TestPoolMetrics(unittest.TestCase):
+    def test_counts_and_hit_rate(self):
+        pool = BoundedPool(Counter(), max_size=2, min_idle=1, metrics=PoolMetrics(sample_every=1))
+        for _ in range(3):
+            with pool.checkout():
+                pass
+        with pool.checkout(), pool.checkout():
+            with self.assertRaises(PoolExhausted):
+                pool.acquire(timeout=0)
+            snapshot = pool.metrics_snapshot()
+            self.assertEqual((snapshot["in_use"], snapshot["idle"]), (2, 0))
+        snapshot = pool.metrics_snapshot()
+        self.assertEqual(snapshot["checkouts"], 5)
+        self.assertEqual(snapshot["reuses"], 4)
+        self.assertEqual(snapshot["creations"], 2)
+        self.assertEqual(snapshot["timeouts"], 1)
+        self.assertEqual(snapshot["hit_rate"], 0.8)
+        self.assertEqual((snapshot["size"], snapshot["idle"], snapshot["in_use"]), (2, 2, 0))
+        self.assertEqual(sum(snapshot["wait_histogram"].values()), 5)
+        self.assertEqual(sum(snapshot["hold_histogram"].values()), 5)
+
+    def test_histogram_buckets(self):
+        pool = BoundedPool(Counter(), max_size=1, metrics=PoolMetrics(sample_every=1))
+        with pool.checkout():
+            time.sleep(0.02)
+        holds = pool.metrics_snapshot()["hold_histogram"]
+        self.assertEqual(holds[0.1], 1)
+        self.assertEqual(sum(holds.values()), 1)
+        self.assertEqual(list(holds)[-1], float("inf"))
+
+    def test_times_one_checkout_in_sample_every(self):
+        pool = BoundedPool(Counter(), max_size=1, metrics=PoolMetrics(sample_every=4))
+        for _ in range(10):
+            pool.release(pool.acquire())
+        snapshot = pool.metrics_snapshot()
+        self.assertEqual((snapshot["checkouts"], snapshot["timed"]), (10, 2))
+        self.assertEqual(sum(snapshot["hold_histogram"].values()), 2)
+
+    def test_counts_from_all_threads(self):
+        pool = ThreadCachedPool(Counter(), max_size=4, metrics=PoolMetrics())
+
+        def work():
+            for _ in range(100):
+                with pool.checkout(timeout=5):
+                    pass
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        snapshot = pool.metrics_snapshot()
+        self.assertEqual(snapshot["checkouts"], 400)
+        self.assertEqual(snapshot["reuses"] + snapshot["creations"], 400)
+
+    def test_exited_threads_shards_are_retired(self):
+        pool = BoundedPool(Counter(), max_size=1, metrics=PoolMetrics(sample_every=3))
+
+        def work():
+            for _ in range(5):
+                pool.release(pool.acquire())
+
+        for _ in range(20):
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+        self.assertEqual(pool.metrics._shards, [])
+        snapshot = pool.metrics_snapshot()
+        self.assertEqual((snapshot["checkouts"], snapshot["timed"]), (100, 20))
+        self.assertEqual(sum(snapshot["hold_histogram"].values()), 20)
+
+    def test_export_callback(self):
+        exported = []
+        pool = BoundedPool(Counter(), max_size=1, metrics=PoolMetrics(export=exported.append, interval=0.01))
+        pool.release(pool.acquire())
+        deadline = time.monotonic() + 5
+        while not exported and time.monotonic() < deadline:
+            time.sleep(0.01)
+        pool.shutdown()
+        self.assertEqual(exported[0]["checkouts"], 1)
+
+    def test_pool_without_metrics(self):
+        with self.assertRaises(ValueError):
+            BoundedPool(Counter(), max_size=1).metrics_snapshot()
+
+
+class TestForkSafety(unittest.TestCase):
+    def test_after_fork_drops_inherited_objects(self):
+        closed = []
+        pool = BoundedPool(Counter(), max_size=3, min_idle=2, close=closed.append)
+        held = pool.acquire()
+        pool._after_fork()
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+        self.assertEqual(pool.acquire(timeout=0), "obj3")
+        # an object checked out in the parent is let go, not pooled
+        pool.release(held)
+        self.assertEqual((pool.size, pool.idle), (1, 0))
+        self.assertEqual(closed, [])
+
+    def test_thread_cached_pool_after_fork(self):
+        pool = ThreadCachedPool(Counter(), max_size=4, min_idle=4)
+        pool.release(pool.acquire())
+        pool._after_fork()
+        self.assertEqual((pool.size, pool.idle), (0, 0))
+        self.assertEqual(pool.acquire(timeout=0), "obj5")
+
+    @unittest.skipUnless(hasattr(os, "fork"), "needs os.fork")
+    def test_forked_child_builds_its_own_objects(self):
+        pool = BoundedPool(os.getpid, max_size=2, min_idle=2)
+        pid = os.fork()
+        if pid == 0:
+            # in the child: report through the exit status only
+            try:
+                ok = pool.acquire(timeout=1) == os.getpid() and pool.size == 1
+            except BaseException:
+                ok = False
+            os._exit(0 if ok else 1)
+        _, status = os.waitpid(pid, 0)
+        self.assertTrue(os.WIFEXITED(status) and os.WEXITSTATUS(status) == 0)
+        # the parent's pool is untouched
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        self.assertEqual(pool.acquire(timeout=0), os.getpid())
+
+
+class TestThreadCachedPool(unittest.TestCase):
+    def test_refills_and_spills_in_batches(self):
+        pool = ThreadCachedPool(Counter(), max_size=10, min_idle=6, cache_size=4, batch=3)
+        first = pool.acquire()
+        # the other two objects of the batch moved to this thread's list
+        self.assertEqual((len(pool._idle), pool.idle), (3, 5))
+        items = [first] + [pool.acquire() for _ in range(5)]
+        self.assertEqual(len(set(items)), 6)
+        for item in items:
+            pool.release(item)
+        # five released objects overflowed the list of four once
+        self.assertEqual((len(pool._idle), pool.idle), (3, 6))
+
+    def test_takes_from_other_threads_when_exhausted(self):
+        pool = ThreadCachedPool(Counter(), max_size=2)
+
+        def hold_and_release():
+            pool.release(pool.acquire())
+
+        worker = threading.Thread(target=hold_and_release)
+        worker.start()
+        worker.join()
+        self.assertEqual(pool.acquire(timeout=0), "obj1")
+        self.assertEqual(pool.acquire(timeout=0), "obj2")
+        with self.assertRaises(PoolExhausted):
+            pool.acquire(timeout=0.01)
+
+    def test_waiter_wakes_on_release_from_another_thread(self):
+        pool = ThreadCachedPool(Counter(), max_size=1)
+        holder_has_it = threading.Event()
+        release = threading.Event()
+
+        def holder():
+            item = pool.acquire()
+            holder_has_it.set()
+            release.wait()
+            pool.release(item)
+
+        worker = threading.Thread(target=holder)
+        worker.start()
+        holder_has_it.wait()
+        threading.Timer(0.05, release.set).start()
+        self.assertEqual(pool.acquire(timeout=5), "obj1")
+        worker.join()
+
+    def test_never_exceeds_max_size_under_contention(self):
+        factory = Counter()
+        pool = ThreadCachedPool(factory, max_size=4, cache_size=2, batch=2)
+        errors = []
+
+        def work():
+            try:
+                for _ in range(2000):
+                    with pool.checkout(timeout=5):
+                        pass
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(factory.created, 4)
+        self.assertEqual(pool.idle, pool.size)
+
+    def test_reaps_thread_lists(self):
+        pool = ThreadCachedPool(Handle, max_size=4, min_idle=1, idle_ttl=0.05, reap_interval=3600)
+        handles = [pool.acquire() for _ in range(4)]
+        for handle in handles:
+            pool.release(handle)
+        self.assertEqual((len(pool._idle), pool.idle), (0, 4))
+        self.assertEqual(pool.reap(), 0)
+        time.sleep(0.06)
+        fresh = pool.acquire()
+        pool.release(fresh)
+        self.assertEqual(pool.reap(), 2)
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+        # the object used last stays on the thread's list
+        self.assertIs(pool.acquire(), fresh)
+        pool.shutdown()
+
+    def test_exited_threads_lists_go_back_to_the_store(self):
+        pool = ThreadCachedPool(Handle, max_size=4, idle_ttl=0.05, reap_interval=3600)
+
+        def work():
+            with pool.checkout(timeout=5):
+                pass
+
+        for _ in range(50):
+            worker = threading.Thread(target=work)
+            worker.start()
+            worker.join()
+        self.assertEqual(pool._caches, [])
+        self.assertEqual((len(pool._idle), pool.size), (1, 1))
+        # only objects in the shared store are reaped
+        time.sleep(0.06)
+        self.assertEqual(pool.reap(), 1)
+        self.assertEqual(pool.size, 0)
+        pool.shutdown()
+
+
+class TestBatchCheckout(unittest.TestCase):
+    def test_acquire_many_is_all_or_nothing(self):
+        pool = BoundedPool(Counter(), max_size=3, min_idle=2)
+        held = pool.acquire()
+        with self.assertRaises(PoolExhausted):
+            pool.acquire_many(3, timeout=0.01)
+        self.assertEqual((pool.size, pool.idle), (2, 1))
+        pool.release(held)
+        items = pool.acquire_many(3, timeout=0)
+        self.assertEqual(sorted(items), ["obj1", "obj2", "obj3"])
+        with self.assertRaises(ValueError):
+            pool.acquire_many(4)
+
+    def test_acquire_many_does_not_deadlock(self):
+        pool = BoundedPool(Counter(), max_size=3)
+        errors = []
+
+        def work():
+            try:
+                for _ in range(200):
+                    items = pool.acquire_many(2, timeout=5)
+                    for item in items:
+                        pool.release(item)
+            except Exception as exc:
+                errors.append(exc)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(pool.size, 3)
+
+    def test_batch_waiter_does_not_swallow_wakeups(self):
+        for cls in (BoundedPool, ThreadCachedPool):
+            pool = cls(Counter(), max_size=2)
+            held = [pool.acquire(), pool.acquire()]
+            got = []
+
+            def wait_for(count):
+                deadline = time.monotonic() + 5
+                while len(pool._available._waiters) < count and time.monotonic() < deadline:
+                    time.sleep(0.001)
+
+            # the batch waiter is first in line for notify()
+            batch = threading.Thread(target=lambda: got.append(pool.acquire_many(2, timeout=5)))
+            batch.start()
+            wait_for(1)
+            single = threading.Thread(target=lambda: got.append(pool.acquire(timeout=1.5)))
+            single.start()
+            wait_for(2)
+            began = time.monotonic()
+            pool.release(held.pop())
+            single.join()
+            self.assertLess(time.monotonic() - began, 1)
+            self.assertEqual(len(got), 1)
+            pool.release(got[0])
+            pool.release(held.pop())
+            batch.join()
+            self.assertEqual(len(got[1]), 2)
+
+    def test_acquire_many_replaces_invalid_objects(self):
+        pool = BoundedPool(Handle, max_size=2, min_idle=2, validate=lambda h: h.healthy)
+        stale = pool._idle[0]
+        stale.healthy = False
+        items = pool.acquire_many(2)
+        self.assertNotIn(stale, items)
+        self.assertEqual(pool.size, 2)
+
+    def test_acquire_many_survives_a_failing_close(self):
+        def close(handle):
+            raise OSError("already closed")
+
+        pool = BoundedPool(Handle, max_size=3, min_idle=3, validate=lambda h: h.healthy, close=close)
+        pool._idle[0].healthy = False
+        with self.assertLogs("patterns.creational.pool", "ERROR"):
+            items = pool.acquire_many(3)
+        self.assertEqual((len(items), pool.size), (3, 3))
+        for item in items:
+            pool.release(item)
+        self.assertEqual(pool.idle, 3)
+
+    def test_acquire_many_recounts_thread_lists(self):
+        pool = ThreadCachedPool(Counter(), max_size=2)
+        filled, done = threading.Event(), threading.Event()
+
+        def owner():
+            items = [pool.acquire(), pool.acquire()]
+            for item in items:
+                pool.release(item)
+            filled.set()
+            done.wait()
+
+        worker = threading.Thread(target=owner)
+        worker.start()
+        self.addCleanup(done.set)
+        filled.wait()
+        take_idle = pool._take_idle
+        taken = []
+
+        def racing_take_idle():
+            # the owner takes an object back from its list after acquire_many
+            # counted it, but before it was taken
+            if not taken:
+                taken.append(pool._caches[0].pop())
+            return take_idle()
+
+        pool._take_idle = racing_take_idle
+        with self.assertRaises(PoolExhausted):
+            pool.acquire_many(2, timeout=0.05)
+        done.set()
+        worker.join()
+        self.assertEqual((pool.size, pool.idle), (2, 1))
+
+    def test_failing_factory_returns_the_batch(self):
+        calls = []
+
+        def factory():
+            calls.append(None)
+            if len(calls) > 1:
+                raise RuntimeError("cannot connect")
+            return "obj1"
+
+        pool = BoundedPool(factory, max_size=3, min_idle=1)
+        with self.assertRaises(RuntimeError):
+            pool.acquire_many(3)
+        self.assertEqual((pool.size, pool.idle), (1, 1))
+
+    def test_thread_cached_pool_takes_from_thread_lists(self):
+        pool = ThreadCachedPool(Counter(), max_size=3)
+        pool.release(pool.acquire())
+        self.assertEqual(len(pool._idle), 0)
+        self.assertEqual(sorted(pool.acquire_many(3, timeout=0)), ["obj1", "obj2", "obj3"])
+
+    def test_prewarm_runs_factory_concurrently(self):
+        def slow_factory():
+            time.sleep(0.1)
+            return object()
+
+        pool = BoundedPool(slow_factory, max_size=10)
+        began = time.monotonic()
+        self.assertEqual(pool.prewarm(8, workers=8), 8)
+        self.assertLess(time.monotonic() - began, 0.5)
+        self.assertEqual((pool.size, pool.idle), (8, 8))
+        # never beyond max_size
+        self.assertEqual(pool.prewarm(8, workers=8), 2)
+
+    def test_prewarm_keeps_what_was_made(self):
+        calls = []
+
+        def factory():
+            calls.append(None)
+            if len(calls) == 2:
+                raise RuntimeError("cannot connect")
+            return object()
+
+        pool = BoundedPool(factory, max_size=5)
+        with self.assertRaises(RuntimeError):
+            pool.prewarm(3)
+        self.assertEqual((pool.size, pool.idle), (2, 2))
+
+
+class TestAsyncObjectPool(unittest.TestCase):
+    def test_async_factory_and_reuse(self):
+        async def factory():
+            await asyncio.sleep(0)
+            return object()
+
+        async def run():
+            pool = AsyncObjectPool(factory, max_size=2)
+            async with pool.acquire() as first:
+                pass
+            async with pool.acquire() as again:
+                self.assertIs(again, first)
+            return pool.size, pool.idle
+
+        self.assertEqual(asyncio.run(run()), (1, 1))
+
+    def test_waiters_are_served_in_order(self):
+        order = []
+
+        async def worker(pool, name):
+            async with pool.acquire():
+                order.append(name)
+                await asyncio.sleep(0.001)
+
+        async def run():
+            pool = AsyncObjectPool(Counter(), max_size=1)
+            await asyncio.gather(*(worker(pool, n) for n in range(10)))
+            return pool.size
+
+        self.assertEqual(asyncio.run(run()), 1)
+        self.assertEqual(order, list(range(10)))
+
+    def test_timeout_raises_pool_exhausted(self):
+        async def run():
+            pool = AsyncObjectPool(Counter(), max_size=1)
+            async with pool.acquire():
+                with self.assertRaises(PoolExhausted):
+                    await pool.get(timeout=0.01)
+            return pool.idle
+
+        self.assertEqual(asyncio.run(run()), 1)
+
+    def test_cancelled_waiter_does_not_leak(self):
+        async def run():
+            pool = AsyncObjectPool(Counter(), max_size=1)
+            item = await pool.get()
+            waiter = asyncio.ensure_future(pool.get())
+            await asyncio.sleep(0)
+            # hand the object over, then cancel before the waiter resumes
+            pool.put(item)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(pool.idle, 1)
+            return await pool.get(timeout=0)
+
+        self.assertEqual(asyncio.run(run()), "obj1")
+
+    def test_discard_lets_a_waiter_create(self):
+        async def run():
+            pool = AsyncObjectPool(Counter(), max_size=1)
+            item = await pool.get()
+            waiter = asyncio.ensure_future(pool.get())
+            await asyncio.sleep(0)
+            pool.discard(item)
+            return await waiter, pool.size
+
+        self.assertEqual(asyncio.run(run()), ("obj2", 1))
+
+    def test_failing_factory_frees_its_slot(self):
+        async def factory():
+            raise RuntimeError("cannot connect")
+
+        async def run():
+            pool = AsyncObjectPool(factory, max_size=1)
+            with self.assertRaises(RuntimeError):
+                await pool.get()
+            return pool.size
+
+        self.assertEqual(asyncio.run(run()), 0)
+
+
+class TestBufferPool(unittest.TestCase):
+    def test_size_classes(self):
+        pool = BufferPool(min_size=300, max_size=4096)
+        self.assertEqual(pool.min_size, 512)
+        self.assertEqual([pool.size_class(n) for n in (1, 512, 513, 4096)], [512, 512, 1024, 4096])
+        self.assertIsNone(pool.size_class(4097))
+
+    def test_max_size_between_classes(self):
+        pool = BufferPool(min_size=256, max_size=1000)
+        self.assertEqual(pool.size_class(512), 512)
+        self.assertIsNone(pool.size_class(900))
+        with pool.checkout(900) as buf:
+            self.assertEqual(len(buf), 900)
+        self.assertEqual(pool.nbytes, 0)
+        # 300 rounds up to 512, above max_size
+        with self.assertRaises(ValueError):
+            BufferPool(300, 400)
+        with self.assertRaises(ValueError):
+            pool.acquire(-5)
+
+    @unittest.skipUnless(hasattr(pickle, "PickleBuffer"), "needs pickle.PickleBuffer")
+    def test_exported_buffer_is_not_reused(self):
+        pool = BufferPool(min_size=64)
+        buf = pool.acquire(64)
+        # holds a buffer export of the view, so it cannot be released
+        exported = pickle.PickleBuffer(buf)
+        pool.release(buf)
+        exported.raw()[:3] = b"abc"
+        with pool.checkout(64) as again:
+            self.assertNotEqual(bytes(again[:3]), b"abc")
+
+    def test_buffers_are_reused(self):
+        pool = BufferPool(min_size=64)
+        with pool.checkout(100) as buf:
+            self.assertEqual(len(buf), 100)
+            buf[:3] = b"abc"
+        self.assertEqual(pool.nbytes, 128)
+        with pool.checkout(128) as again:
+            self.assertEqual(bytes(again[:3]), b"abc")
+        self.assertEqual(pool.nbytes, 128)
+
+    def test_zero_on_release(self):
+        pool = BufferPool(min_size=64, zero_on_release=True)
+        with pool.checkout(64) as buf:
+            buf[:] = b"x" * 64
+        with pool.checkout(64) as again:
+            self.assertEqual(bytes(again), bytes(64))
+
+    def test_released_view_cannot_be_used(self):
+        pool = BufferPool()
+        buf = pool.acquire(10)
+        pool.release(buf)
+        with self.assertRaises(ValueError):
+            buf[0] = 1
+
+    def test_arena_slices(self):
+        pool = BufferPool(min_size=1024, max_size=4096, arena_size=8192)
+        self.assertEqual(pool.nbytes, 3 * 8192)
+        views = [pool.acquire(1024) for _ in range(8)]
+        for index, view in enumerate(views):
+            view[:] = bytes([index]) * 1024
+        self.assertEqual([view[0] for view in views], list(range(8)))
+        # the arena is used up: the ninth buffer is allocated separately
+        extra = pool.acquire(1000)
+        self.assertEqual(pool.nbytes, 3 * 8192 + 1024)
+        for view in views + [extra]:
+            pool.release(view)
+
+    def test_oversized_requests_are_not_pooled(self):
+        pool = BufferPool(max_size=1024)
+        with pool.checkout(5000) as buf:
+            self.assertEqual(len(buf), 5000)
+        self.assertEqual(pool.nbytes, 0)
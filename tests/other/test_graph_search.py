@@ -0,0 +1,878 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+import unittest
+from array import array
+from unittest import mock
+
+from patterns.other import graph_search as graph_search_module
+from patterns.other.graph_search import (
+    AsyncGraphSearch,
+    BFSTreeCache,
+    CSRGraph,
+    GraphSearch,
+    ReachabilityIndex,
+)
+
+GRAPH = {
+    "A": ["B", "C"],
+    "B": ["C", "D"],
+    "C": ["D", "G"],
+    "D": ["C"],
+    "E": ["F"],
+    "F": ["C"],
+    "G": ["E"],
+    "H": ["C"],
+}
+
+QUERIES = [(s, e) for s in "ABCDEFGH" for e in "ABCDEFGHX"]
+
+
+class TestCSRGraph(unittest.TestCase):
+    def setUp(self):
+        self.csr = CSRGraph.from_dict(GRAPH)
+
+    def test_mapping_matches_dict(self):
+        self.assertEqual(self.csr.to_dict(), GRAPH)
+        self.assertEqual(dict(self.csr), GRAPH)
+        self.assertIn("A", self.csr)
+        self.assertNotIn("X", self.csr)
+        self.assertEqual(self.csr.get("X", []), [])
+        with self.assertRaises(KeyError):
+            self.csr["X"]
+
+    def test_node_ids_are_interned(self):
+        a = self.csr.index["A"]
+        self.assertEqual(self.csr.names[a], "A")
+        self.assertEqual(
+            [self.csr.names[i] for i in self.csr.neighbour_ids(a)], ["B", "C"]
+        )
+        self.assertEqual(self.csr.targets.typecode, "l")
+        self.assertEqual(len(self.csr.offsets), len(self.csr) + 1)
+
+    def test_target_only_nodes_get_empty_rows(self):
+        csr = CSRGraph.from_dict({"A": ["Z"]})
+        self.assertEqual(csr["Z"], [])
+        self.assertEqual(len(csr), 2)
+
+    def test_find_methods_match_dict_backend(self):
+        plain = GraphSearch(GRAPH)
+        compact = GraphSearch(self.csr)
+        for start, end in QUERIES:
+            for method in (
+                "find_path_dfs",
+                "find_all_paths_dfs",
+                "find_shortest_path_dfs",
+                "find_shortest_path_bfs",
+            ):
+                self.assertEqual(
+                    getattr(compact, method)(start, end),
+                    getattr(plain, method)(start, end),
+                    (method, start, end),
+                )
+
+
+class TestBidirectionalBFS(unittest.TestCase):
+    def test_matches_single_ended_on_example_graph(self):
+        graph_search = GraphSearch(GRAPH)
+        for start, end in QUERIES:
+            self.assertEqual(
+                graph_search.find_shortest_path_bfs(start, end, bidirectional=True),
+                graph_search.find_shortest_path_bfs(start, end),
+                (start, end),
+            )
+
+    def test_finds_shortest_paths_on_random_graph(self):
+        rng = random.Random(7)
+        graph = {n: rng.sample(range(200), 3) for n in range(200)}
+        graph_search = GraphSearch(graph)
+        for _ in range(200):
+            start, end = rng.randrange(200), rng.randrange(200)
+            expected = graph_search.find_shortest_path_bfs(start, end)
+            path = graph_search.find_shortest_path_bfs(start, end, bidirectional=True)
+            if expected is None:
+                self.assertIsNone(path)
+                continue
+            self.assertEqual(len(path), len(expected))
+            self.assertEqual((path[0], path[-1]), (start, end))
+            for a, b in zip(path, path[1:]):
+                self.assertIn(b, graph[a])
+
+    def test_reverse_graph_is_cached(self):
+        graph_search = GraphSearch(GRAPH)
+        reverse = graph_search.reverse_graph()
+        self.assertEqual(reverse["C"], ["A", "B", "D", "F", "H"])
+        self.assertEqual(reverse["A"], [])
+        self.assertIs(graph_search.reverse_graph(), reverse)
+
+
+class TestIterativeDFS(unittest.TestCase):
+    def test_prefix_path_is_honoured_and_not_mutated(self):
+        graph_search = GraphSearch(GRAPH)
+        prefix = ["Z"]
+        self.assertEqual(graph_search.find_path_dfs("A", "D", prefix), ["Z", "A", "B", "C", "D"])
+        self.assertEqual(prefix, ["Z"])
+        # nodes already on the prefix are never revisited
+        self.assertEqual(graph_search.find_all_paths_dfs("A", "D", ["B"]), [["B", "A", "C", "D"]])
+
+    def test_long_chain_does_not_hit_recursion_limit(self):
+        n = 10 ** 5
+        graph = {i: [i + 1] for i in range(n - 1)}
+        graph_search = GraphSearch(graph)
+        expected = list(range(n))
+        self.assertEqual(graph_search.find_path_dfs(0, n - 1), expected)
+        self.assertEqual(graph_search.find_all_paths_dfs(0, n - 1), [expected])
+        self.assertEqual(graph_search.find_shortest_path_dfs(0, n - 1), expected)
+        self.assertIsNone(graph_search.find_path_dfs(n - 1, 0))
+
+
+class TestIterAllPaths(unittest.TestCase):
+    def setUp(self):
+        self.graph_search = GraphSearch(GRAPH)
+
+    def test_yields_same_paths_lazily(self):
+        paths = self.graph_search.iter_all_paths_dfs("A", "D")
+        self.assertIsInstance(paths, types.GeneratorType)
+        self.assertEqual(list(paths), self.graph_search.find_all_paths_dfs("A", "D"))
+
+    def test_max_paths(self):
+        self.assertEqual(
+            list(self.graph_search.iter_all_paths_dfs("A", "D", max_paths=2)),
+            [["A", "B", "C", "D"], ["A", "B", "D"]],
+        )
+        self.assertEqual(list(self.graph_search.iter_all_paths_dfs("A", "D", max_paths=0)), [])
+
+    def test_max_depth(self):
+        self.assertEqual(
+            list(self.graph_search.iter_all_paths_dfs("A", "D", max_depth=2)),
+            [["A", "B", "D"], ["A", "C", "D"]],
+        )
+        self.assertEqual(list(self.graph_search.iter_all_paths_dfs("A", "F", max_depth=3)), [])
+        self.assertEqual(list(self.graph_search.iter_all_paths_dfs("A", "A", max_depth=0)), [["A"]])
+
+    def test_deadline(self):
+        # complete graph: far too many paths to enumerate before the deadline
+        graph = {i: [j for j in range(12) if j != i] for i in range(12)}
+        graph_search = GraphSearch(graph)
+        begin = time.monotonic()
+        paths = list(graph_search.iter_all_paths_dfs(0, 11, deadline=begin + 0.05))
+        self.assertLess(time.monotonic() - begin, 1)
+        self.assertTrue(paths)
+
+
+def random_weighted_graph(n, degree, seed):
+    rng = random.Random(seed)
+    return {
+        node: {rng.randrange(n): rng.randint(1, 9) for _ in range(degree)}
+        for node in range(n)
+    }
+
+
+def path_cost(graph, path):
+    return sum(graph[a][b] for a, b in zip(path, path[1:]))
+
+
+class TestWeightedSearch(unittest.TestCase):
+    def test_weighted_csr_round_trip(self):
+        graph = random_weighted_graph(50, 3, 1)
+        csr = CSRGraph.from_dict(graph)
+        self.assertEqual(csr.weights.typecode, "d")
+        self.assertEqual(csr.to_dict(), graph)
+        self.assertEqual(
+            GraphSearch(csr).find_shortest_path_bfs(0, 7),
+            GraphSearch(graph).find_shortest_path_bfs(0, 7),
+        )
+
+    def test_dijkstra_finds_cheapest_path(self):
+        graph = random_weighted_graph(12, 3, 2)
+        for backend in (graph, CSRGraph.from_dict(graph)):
+            graph_search = GraphSearch(backend)
+            for start in range(12):
+                for end in range(12):
+                    paths = graph_search.find_all_paths_dfs(start, end)
+                    result = graph_search.find_shortest_path_dijkstra(start, end)
+                    if not paths:
+                        self.assertIsNone(result)
+                        continue
+                    path, cost = result
+                    self.assertEqual(cost, min(path_cost(graph, p) for p in paths))
+                    self.assertEqual(path_cost(graph, path), cost)
+
+    def test_unweighted_edges_cost_one(self):
+        self.assertEqual(
+            GraphSearch(GRAPH).find_shortest_path_dijkstra("A", "F"),
+            (["A", "C", "G", "E", "F"], 4),
+        )
+        self.assertEqual(GraphSearch(GRAPH).find_shortest_path_dijkstra("A", "A"), (["A"], 0))
+
+    def test_astar_matches_dijkstra_on_grid(self):
+        size = 15
+        rng = random.Random(3)
+        graph = {}
+        for x in range(size):
+            for y in range(size):
+                graph[x, y] = {
+                    (x + dx, y + dy): rng.randint(1, 5)
+                    for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1))
+                    if 0 <= x + dx < size and 0 <= y + dy < size
+                }
+        graph_search = GraphSearch(graph)
+        goal = (size - 1, size - 1)
+        manhattan = lambda node: abs(goal[0] - node[0]) + abs(goal[1] - node[1])
+        _, expected = graph_search.find_shortest_path_dijkstra((0, 0), goal)
+        path, cost = graph_search.find_shortest_path_astar((0, 0), goal, manhattan)
+        self.assertEqual(cost, expected)
+        self.assertEqual(path_cost(graph, path), cost)
+
+
+class TestReachabilityIndex(unittest.TestCase):
+    def test_matches_search_results(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            graph = {n: rng.sample(range(30), rng.randrange(3)) for n in range(30)}
+            graph_search = GraphSearch(graph)
+            expected = {
+                (s, e): graph_search.find_shortest_path_bfs(s, e) is not None
+                for s in range(31)
+                for e in range(31)
+            }
+            index = graph_search.build_reachability_index()
+            for (start, end), reachable in expected.items():
+                self.assertEqual(index.reachable(start, end), reachable, (seed, start, end))
+
+    def test_searches_skip_unreachable_pairs(self):
+        graph_search = GraphSearch(GRAPH)
+        graph_search.build_reachability_index()
+        # the index is consulted before the graph is ever read
+        graph_search.graph = {}
+        self.assertIsNone(graph_search.find_path_dfs("C", "H"))
+        self.assertEqual(graph_search.find_all_paths_dfs("C", "H"), [])
+        self.assertIsNone(graph_search.find_shortest_path_dfs("C", "H"))
+        self.assertIsNone(graph_search.find_shortest_path_bfs("A", "H"))
+        self.assertIsNone(graph_search.find_shortest_path_dijkstra("A", "H"))
+
+    def test_results_unchanged_with_index(self):
+        plain = GraphSearch(GRAPH)
+        indexed = GraphSearch(GRAPH)
+        indexed.build_reachability_index()
+        for start, end in QUERIES:
+            self.assertEqual(indexed.find_all_paths_dfs(start, end), plain.find_all_paths_dfs(start, end))
+            self.assertEqual(indexed.find_shortest_path_bfs(start, end), plain.find_shortest_path_bfs(start, end))
+
+    def test_reports_cost(self):
+        index = GraphSearch(GRAPH).build_reachability_index()
+        self.assertGreater(index.nbytes, 0)
+        self.assertGreaterEqual(index.build_seconds, 0)
+        # C, D, G, E and F form one strongly connected component
+        self.assertEqual(len({index.component[n] for n in "CDEFG"}), 1)
+        self.assertEqual(index.components, 4)
+
+    def test_deep_graph_builds_without_recursion(self):
+        n = 10 ** 5
+        graph = {i: [i + 1] for i in range(n - 1)}
+        graph[n - 1] = [0]
+        index = ReachabilityIndex(graph)
+        self.assertEqual(index.components, 1)
+        self.assertTrue(index.reachable(n - 1, n // 2))
+
+    def test_memory_is_linear(self):
+        n = 40000
+        index = ReachabilityIndex({i: [i + 1] for i in range(n - 1)})
+        self.assertEqual(index.components, n)
+        self.assertLess(index.nbytes, 200 * n)
+        self.assertTrue(index.reachable(0, n - 1))
+        self.assertFalse(index.reachable(n - 1, 0))
+
+    def test_random_dags(self):
+        for seed in range(5):
+            rng = random.Random(seed)
+            # edges only go to higher numbers, so every node is a component
+            graph = {n: [m for m in range(n + 1, 60) if rng.random() < 0.05] for n in range(60)}
+            graph_search = GraphSearch(graph)
+            index = ReachabilityIndex(graph)
+            for start in range(60):
+                reached = {node for layer in graph_search.bfs_layers(start) for node in layer}
+                for end in range(60):
+                    self.assertEqual(index.reachable(start, end), end in reached, (seed, start, end))
+
+
+class TestBFSTreeCache(unittest.TestCase):
+    def test_cached_paths_match_uncached(self):
+        rng = random.Random(11)
+        graph = {n: rng.sample(range(100), 3) for n in range(100)}
+        plain = GraphSearch(graph)
+        cached = GraphSearch(graph)
+        cache = cached.enable_bfs_cache(max_bytes=2 ** 20)
+        for start in range(0, 100, 10):
+            for end in range(101):
+                self.assertEqual(
+                    cached.find_shortest_path_bfs(start, end),
+                    plain.find_shortest_path_bfs(start, end),
+                )
+        self.assertEqual(len(cache), 10)
+        self.assertEqual(cache.misses, 10)
+        # start == end never reaches the cache
+        self.assertEqual(cache.hits, 10 * 100 - 10)
+
+    def test_lru_eviction_by_memory_budget(self):
+        graph = {i: [i + 1] for i in range(50)}
+        cache = BFSTreeCache(max_bytes=1)
+        cache.put(0, {}, {})
+        self.assertEqual(len(cache), 0)
+
+        graph_search = GraphSearch(graph)
+        tree = graph_search._bfs_tree(0)
+        size = sys.getsizeof(tree[0]) + sys.getsizeof(tree[1])
+        cache = graph_search.enable_bfs_cache(max_bytes=2 * size)
+        graph_search.find_shortest_path_bfs(0, 5)
+        graph_search.find_shortest_path_bfs(1, 5)
+        graph_search.find_shortest_path_bfs(0, 6)  # 0 becomes most recently used
+        graph_search.find_shortest_path_bfs(2, 5)
+        self.assertIn(0, cache)
+        self.assertNotIn(1, cache)
+        self.assertIn(2, cache)
+        self.assertLessEqual(cache.nbytes, cache.max_bytes)
+
+    def test_mutation_invalidates_cache(self):
+        graph_search = GraphSearch({k: list(v) for k, v in GRAPH.items()})
+        cache = graph_search.enable_bfs_cache(max_bytes=2 ** 20)
+        self.assertEqual(graph_search.find_shortest_path_bfs("A", "F"), ["A", "C", "G", "E", "F"])
+        graph_search.add_edge("A", "F")
+        self.assertEqual(graph_search.version, 1)
+        self.assertEqual(graph_search.find_shortest_path_bfs("A", "F"), ["A", "F"])
+        graph_search.remove_edge("A", "F")
+        self.assertEqual(graph_search.find_shortest_path_bfs("A", "F"), ["A", "C", "G", "E", "F"])
+        self.assertEqual(cache.hits, 0)
+
+    def test_mutation_on_weighted_graph(self):
+        graph_search = GraphSearch({"A": {"B": 2}})
+        graph_search.add_edge("A", "C", 5)
+        graph_search.add_edge("C", "B", cost=1)
+        self.assertEqual(graph_search.graph, {"A": {"B": 2, "C": 5}, "C": {"B": 1}})
+        with self.assertRaises(KeyError):
+            graph_search.remove_edge("A", "X")
+
+    def test_csr_graph_is_read_only(self):
+        graph_search = GraphSearch(CSRGraph.from_dict(GRAPH))
+        with self.assertRaises(TypeError):
+            graph_search.add_edge("A", "H")
+
+
+class TestBatchShortestPaths(unittest.TestCase):
+    def test_matches_sequential_queries_in_input_order(self):
+        rng = random.Random(5)
+        graph = {n: rng.sample(range(300), 2) for n in range(300)}
+        graph_search = GraphSearch(graph)
+        pairs = [(rng.randrange(300), rng.randrange(301)) for _ in range(200)]
+        pairs.append((7, 7))
+        expected = [graph_search.find_shortest_path_bfs(start, end) for start, end in pairs]
+        self.assertEqual(graph_search.batch_shortest_paths(pairs, workers=2), expected)
+        self.assertEqual(graph_search.batch_shortest_paths(pairs), expected)
+
+    def test_named_nodes_and_csr_backend(self):
+        pairs = [(s, e) for s in "AH" for e in "ADFHX"]
+        expected = [GraphSearch(GRAPH).find_shortest_path_bfs(s, e) for s, e in pairs]
+        graph_search = GraphSearch(CSRGraph.from_dict(GRAPH))
+        self.assertEqual(graph_search.batch_shortest_paths(pairs, workers=2), expected)
+
+
+class TestGraphFile(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.path = os.path.join(tmp.name, "graph.bin")
+
+    def round_trip(self, graph):
+        CSRGraph.from_dict(graph).save(self.path)
+        return CSRGraph.load(self.path)
+
+    def test_named_graph_round_trip(self):
+        loaded = self.round_trip(GRAPH)
+        self.assertIsInstance(loaded.targets, memoryview)
+        self.assertEqual(loaded.to_dict(), GRAPH)
+        self.assertEqual(loaded.index["G"], CSRGraph.from_dict(GRAPH).index["G"])
+        self.assertNotIn("X", loaded)
+        self.assertNotIn(1, loaded)
+        plain, mapped = GraphSearch(GRAPH), GraphSearch(loaded)
+        for start, end in QUERIES:
+            self.assertEqual(mapped.find_all_paths_dfs(start, end), plain.find_all_paths_dfs(start, end))
+            self.assertEqual(mapped.find_shortest_path_bfs(start, end), plain.find_shortest_path_bfs(start, end))
+
+    def test_int_and_weighted_round_trip(self):
+        graph = random_weighted_graph(40, 3, 9)
+        loaded = self.round_trip(graph)
+        self.assertEqual(loaded.to_dict(), graph)
+        self.assertNotIn("1", loaded)
+        self.assertEqual(
+            GraphSearch(loaded).find_shortest_path_dijkstra(0, 17),
+            GraphSearch(graph).find_shortest_path_dijkstra(0, 17),
+        )
+
+    def test_unicode_names(self):
+        graph = {"Zürich": ["Genève", "Bern"], "Bern": ["Zürich"], "Genève": []}
+        self.assertEqual(self.round_trip(graph).to_dict(), graph)
+
+    def test_batch_queries_on_loaded_graph(self):
+        loaded = self.round_trip(GRAPH)
+        pairs = [("A", "F"), ("A", "H"), ("G", "D")]
+        self.assertEqual(
+            GraphSearch(loaded).batch_shortest_paths(pairs, workers=2),
+            [GraphSearch(GRAPH).find_shortest_path_bfs(s, e) for s, e in pairs],
+        )
+
+    def test_rejects_mixed_names_and_foreign_files(self):
+        with self.assertRaises(TypeError):
+            CSRGraph.from_dict({"A": [1]}).save(self.path)
+        with open(self.path, "wb") as f:
+            f.write(b"not a graph file at all, definitely")
+        with self.assertRaises(ValueError):
+            CSRGraph.load(self.path)
+
+    def test_rejects_truncated_files(self):
+        for graph in (GRAPH, {n: [n + 1] for n in range(20)}, random_weighted_graph(10, 2, 4)):
+            CSRGraph.from_dict(graph).save(self.path)
+            with open(self.path, "rb") as f:
+                data = f.read()
+            # the last section is 8-byte records, so any shorter file loses data
+            for length in range(0, len(data), 8):
+                with open(self.path, "wb") as f:
+                    f.write(data[:length])
+                with self.assertRaisesRegex(ValueError, "is not a graph file"):
+                    CSRGraph.load(self.path)
+
+
+class TestBFSDistances(unittest.TestCase):
+    def check_against_bfs(self, graph):
+        graph_search = GraphSearch(graph)
+        csr = graph_search.as_csr()
+        for start in list(graph)[:10]:
+            dist, parent = graph_search.bfs_distances(start)
+            self.assertEqual(dist[csr.index[start]], 0)
+            for end in csr.names:
+                path = graph_search.find_shortest_path_bfs(start, end)
+                self.assertEqual(graph_search.path_from_parents(parent, start, end), path)
+                self.assertEqual(dist[csr.index[end]], -1 if path is None else len(path) - 1)
+
+    def test_pure_python_layers(self):
+        with mock.patch.object(graph_search_module, "np", None):
+            dist, _ = GraphSearch(GRAPH).bfs_distances("A")
+            self.assertIsInstance(dist, array)
+            self.check_against_bfs(GRAPH)
+            self.check_against_bfs({n: random.Random(n).sample(range(60), 2) for n in range(60)})
+
+    @unittest.skipIf(graph_search_module.np is None, "NumPy is not installed")
+    def test_numpy_layers(self):
+        dist, _ = GraphSearch(GRAPH).bfs_distances("A")
+        self.assertIsInstance(dist, graph_search_module.np.ndarray)
+        self.check_against_bfs(GRAPH)
+        self.check_against_bfs({n: random.Random(n).sample(range(60), 2) for n in range(60)})
+
+    def test_csr_is_rebuilt_after_mutation(self):
+        graph_search = GraphSearch({"A": ["B"], "B": []})
+        _, parent = graph_search.bfs_distances("A")
+        self.assertIsNone(graph_search.path_from_parents(parent, "A", "C"))
+        graph_search.add_edge("B", "C")
+        _, parent = graph_search.bfs_distances("A")
+        self.assertEqual(graph_search.path_from_parents(parent, "A", "C"), ["A", "B", "C"])
+
+    def test_path_must_start_at_start(self):
+        graph_search = GraphSearch({"A": ["B"], "B": ["C"], "C": []})
+        _, parent = graph_search.bfs_distances("A")
+        self.assertEqual(graph_search.path_from_parents(parent, "B", "C"), ["B", "C"])
+        self.assertIsNone(graph_search.path_from_parents(parent, "C", "B"))
+        self.assertIsNone(graph_search.path_from_parents(parent, "X", "C"))
+
+
+class TestIncrementalMutation(unittest.TestCase):
+    def test_derived_structures_follow_random_mutations(self):
+        rng = random.Random(21)
+        graph = {n: rng.sample(range(25), 2) for n in range(25)}
+        graph_search = GraphSearch(graph)
+        graph_search.enable_bfs_cache(max_bytes=2 ** 20)
+        graph_search.build_reachability_index()
+        graph_search.reverse_graph()
+
+        for step in range(300):
+            nodes = list(graph)
+            op = rng.random()
+            if len(nodes) < 10 or op < 0.4:
+                graph_search.add_edge(rng.choice(nodes), rng.randrange(30))
+            elif op < 0.7:
+                start = rng.choice(nodes)
+                if graph[start]:
+                    graph_search.remove_edge(start, rng.choice(graph[start]))
+            elif op < 0.85:
+                graph_search.add_node(rng.randrange(30))
+            else:
+                graph_search.remove_node(rng.choice(nodes))
+            if graph_search.reachability is None and rng.random() < 0.3:
+                graph_search.build_reachability_index()
+
+            fresh = GraphSearch({k: list(v) for k, v in graph.items()})
+            reverse = {k: sorted(v) for k, v in graph_search.reverse_graph().items() if v}
+            self.assertEqual(reverse, {k: sorted(v) for k, v in fresh.reverse_graph().items() if v})
+            for _ in range(10):
+                start, end = rng.randrange(30), rng.randrange(30)
+                self.assertEqual(
+                    graph_search.find_shortest_path_bfs(start, end),
+                    fresh.find_shortest_path_bfs(start, end),
+                    (step, start, end),
+                )
+
+    def test_unrelated_changes_keep_cached_trees(self):
+        graph_search = GraphSearch({"A": ["B"], "B": ["C"], "C": [], "X": []})
+        cache = graph_search.enable_bfs_cache(max_bytes=2 ** 20)
+        graph_search.find_shortest_path_bfs("A", "C")
+        graph_search.add_edge("X", "C")  # X is not reached from A
+        graph_search.add_edge("C", "B")  # B is already closer to A than C
+        graph_search.add_node("Y")
+        self.assertIn("A", cache)
+
+        index = graph_search.build_reachability_index()
+        graph_search.add_edge("A", "C")  # A already reaches C
+        graph_search.add_node("Z")
+        self.assertIs(graph_search.reachability, index)
+        self.assertFalse(index.reachable("Z", "A"))
+        graph_search.find_shortest_path_bfs("A", "C")
+        graph_search.remove_edge("B", "C")  # no longer on the tree from A
+        self.assertIn("A", cache)
+        graph_search.remove_edge("A", "C")
+        self.assertNotIn("A", cache)
+        self.assertIsNone(graph_search.reachability)
+        self.assertEqual(graph_search.version, 7)
+        graph_search.add_node("Y")
+        self.assertEqual(graph_search.version, 7)
+
+    def test_remove_node(self):
+        graph_search = GraphSearch({k: list(v) for k, v in GRAPH.items()})
+        graph_search.remove_node("C")
+        self.assertNotIn("C", graph_search.graph)
+        self.assertEqual(graph_search.graph["A"], ["B"])
+        self.assertEqual(graph_search.find_shortest_path_bfs("A", "D"), ["A", "B", "D"])
+        with self.assertRaises(KeyError):
+            graph_search.remove_node("C")
+
+    def test_weighted_mutations(self):
+        graph_search = GraphSearch({"A": {"B": 2}, "B": {}})
+        graph_search.add_node("C")
+        graph_search.add_edge("A", "C", 1)
+        graph_search.add_edge("A", "B", 5)
+        self.assertEqual(graph_search.graph, {"A": {"B": 5, "C": 1}, "B": {}, "C": {}})
+        graph_search.remove_node("B")
+        self.assertEqual(graph_search.graph, {"A": {"C": 1}, "C": {}})
+        # a new start node gets a weighted row, with cost 1 by default
+        graph_search.add_edge("D", "A")
+        self.assertEqual(graph_search.graph["D"], {"A": 1})
+
+    def test_cost_on_unweighted_graph(self):
+        graph_search = GraphSearch({"A": ["B"], "B": []})
+        with self.assertRaises(ValueError):
+            graph_search.add_edge("A", "C", 3)
+        self.assertEqual(graph_search.graph, {"A": ["B"], "B": []})
+        empty = GraphSearch({})
+        empty.add_edge("A", "B", 3)
+        self.assertEqual(empty.graph, {"A": {"B": 3}})
+
+    def test_rows_are_scanned_once(self):
+        class CountingDict(dict):
+            scans = 0
+
+            def values(self):
+                CountingDict.scans += 1
+                return super().values()
+
+        graph_search = GraphSearch(CountingDict({"A": ["B"], "B": []}))
+        for node in "CDEFG":
+            graph_search.add_node(node)
+            graph_search.add_edge("A", node)
+        self.assertEqual(CountingDict.scans, 1)
+        self.assertEqual(graph_search.graph["A"], list("BCDEFG"))
+
+
+class TestDeadEndPruning(unittest.TestCase):
+    def test_pruning_keeps_results(self):
+        for seed in range(20):
+            rng = random.Random(seed)
+            graph = {n: rng.sample(range(9), rng.randrange(4)) for n in range(9)}
+            graph_search = GraphSearch(graph)
+            for start in range(9):
+                for end in range(10):
+                    self.assertEqual(
+                        graph_search.find_all_paths_dfs(start, end),
+                        graph_search.find_all_paths_dfs(start, end, prune=False),
+                    )
+                    self.assertEqual(
+                        graph_search.find_shortest_path_dfs(start, end),
+                        graph_search.find_shortest_path_dfs(start, end, prune=False),
+                    )
+
+    def test_pruned_search_never_enters_dead_ends(self):
+        class CountingGraph(dict):
+            reads = 0
+
+            def get(self, key, default=None):
+                CountingGraph.reads += 1
+                return super().get(key, default)
+
+        graph = CountingGraph({"S": ["T", "D1", "D2"], "D1": ["D2"], "D2": ["D3"], "D3": []})
+        graph_search = GraphSearch(graph)
+        CountingGraph.reads = 0
+        self.assertEqual(graph_search.find_all_paths_dfs("S", "T"), [["S", "T"]])
+        self.assertEqual(CountingGraph.reads, 1)
+        CountingGraph.reads = 0
+        self.assertEqual(graph_search.find_all_paths_dfs("S", "T", prune=False), [["S", "T"]])
+        self.assertEqual(CountingGraph.reads, 6)
+
+    def test_sees_edges_added_through_mutations(self):
+        graph_search = GraphSearch({"A": ["B", "C"], "B": [], "C": []})
+        graph_search.reverse_graph()
+        graph_search.add_edge("B", "D")
+        self.assertEqual(graph_search.find_all_paths_dfs("A", "D"), [["A", "B", "D"]])
+        self.assertEqual(graph_search.find_shortest_path_dfs("A", "D"), ["A", "B", "D"])
+
+    def test_reverse_index_is_built_once(self):
+        graph_search = GraphSearch({n: [n + 1] for n in range(1000)})
+        graph_search.find_all_paths_dfs(0, 1)
+        reverse = graph_search._reverse
+        self.assertEqual(graph_search.find_all_paths_dfs(0, 2), [[0, 1, 2]])
+        self.assertIs(graph_search._reverse, reverse)
+
+    def test_streaming_does_not_prune_by_default(self):
+        graph_search = GraphSearch({n: [n + 1] for n in range(1000)})
+        self.assertEqual(list(graph_search.iter_all_paths_dfs(0, 2)), [[0, 1, 2]])
+        self.assertIsNone(graph_search._reverse)
+        # under a deadline, pruning only uses an index already there
+        deadline = time.monotonic() + 10
+        self.assertEqual(list(graph_search.iter_all_paths_dfs(0, 2, deadline=deadline, prune=True)), [[0, 1, 2]])
+        self.assertIsNone(graph_search._reverse)
+
+    def test_csr_graph(self):
+        rng = random.Random(3)
+        graph = {n: rng.sample(range(12), rng.randrange(4)) for n in range(12)}
+        plain, csr = GraphSearch(graph), GraphSearch(CSRGraph.from_dict(graph))
+        for start in range(12):
+            for end in range(13):
+                self.assertEqual(csr.find_all_paths_dfs(start, end), plain.find_all_paths_dfs(start, end, prune=False))
+        # pruning on a CSRGraph builds flat arrays, not a reverse dict
+        self.assertIsNone(csr._reverse)
+        self.assertIs(csr._csr_reverse[0], csr.graph)
+
+
+def grid(side):
+    steps = ((1, 0), (0, 1), (-1, 0), (0, -1))
+    return {
+        (x, y): [(x + dx, y + dy) for dx, dy in steps if 0 <= x + dx < side and 0 <= y + dy < side]
+        for x in range(side)
+        for y in range(side)
+    }
+
+
+class TestBranchAndBound(unittest.TestCase):
+    def test_same_paths_and_tie_breaking(self):
+        graph_search = GraphSearch(GRAPH)
+        for start, end in QUERIES:
+            paths = graph_search.find_all_paths_dfs(start, end)
+            expected = min(paths, key=len) if paths else None
+            self.assertEqual(graph_search.find_shortest_path_dfs(start, end), expected)
+            self.assertEqual(graph_search.find_shortest_path_dfs(start, end, seed=True), expected)
+
+    def test_seed_is_ignored_with_a_prefix(self):
+        # the prefix blocks C, so the BFS length would be a wrong bound
+        graph_search = GraphSearch(GRAPH)
+        self.assertEqual(graph_search.find_shortest_path_dfs("A", "G", ["C"], seed=True), None)
+        self.assertEqual(
+            graph_search.find_shortest_path_dfs("B", "G", ["C"], seed=True),
+            graph_search.find_shortest_path_dfs("B", "G", ["C"]),
+        )
+
+    def test_bounded_search_handles_grids(self):
+        # an 8x8 grid has far too many simple paths to enumerate
+        graph_search = GraphSearch(grid(8))
+        path = graph_search.find_shortest_path_dfs((0, 0), (7, 7))
+        self.assertEqual(len(path), 15)
+        self.assertEqual(graph_search.find_shortest_path_dfs((0, 0), (7, 7), seed=True), path)
+
+
+class TestBFSLayers(unittest.TestCase):
+    def test_layers_match_bfs_distances(self):
+        rng = random.Random(8)
+        graph = {n: rng.sample(range(80), 2) for n in range(80)}
+        graph_search = GraphSearch(graph)
+        edge_to = {}
+        layers = list(graph_search.bfs_layers(0, edge_to=edge_to))
+        self.assertEqual(layers[0], [0])
+        for depth, layer in enumerate(layers):
+            for node in layer:
+                path = graph_search.find_shortest_path_bfs(0, node)
+                self.assertEqual(len(path) - 1, depth)
+                self.assertEqual(GraphSearch._walk_back(edge_to, 0, node), path)
+        reached = [node for layer in layers for node in layer]
+        self.assertEqual(len(reached), len(set(reached)))
+
+    def test_is_lazy_and_respects_budget(self):
+        graph_search = GraphSearch(grid(50))
+        layers = graph_search.bfs_layers((0, 0))
+        self.assertEqual(next(layers), [(0, 0)])
+        self.assertEqual(sorted(next(layers)), [(0, 1), (1, 0)])
+        limited = list(graph_search.bfs_layers((0, 0), max_nodes=10))
+        self.assertEqual([len(layer) for layer in limited], [1, 2, 3, 4])
+        self.assertEqual(sum(map(len, graph_search.bfs_layers((0, 0), max_nodes=12))), 12)
+        self.assertEqual(list(graph_search.bfs_layers((0, 0), max_nodes=0)), [])
+
+
+class SlowAdjacencyService:
+    """Stand-in for a remote adjacency service with artificial latency."""
+
+    def __init__(self, graph, latency=0.005):
+        self.graph = graph
+        self.latency = latency
+        self.calls = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def __call__(self, nodes):
+        self.calls.append(list(nodes))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.latency)
+        self.in_flight -= 1
+        return {node: self.graph[node] for node in nodes if node in self.graph}
+
+
+class TestAsyncGraphSearch(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        self.graph = {n: rng.sample(range(500), 3) for n in range(500)}
+
+    def test_paths_match_sync_search(self):
+        service = SlowAdjacencyService(self.graph, latency=0)
+        remote = AsyncGraphSearch(service)
+        local = GraphSearch(self.graph)
+
+        async def run():
+            return [await remote.find_shortest_path_bfs(0, end) for end in range(0, 501, 25)]
+
+        expected = [local.find_shortest_path_bfs(0, end) for end in range(0, 501, 25)]
+        self.assertEqual(asyncio.run(run()), expected)
+
+    def test_one_request_round_per_layer(self):
+        service = SlowAdjacencyService(self.graph)
+        remote = AsyncGraphSearch(service, batch_size=50, max_in_flight=3)
+
+        async def run():
+            return [layer async for layer in remote.bfs_layers(0)]
+
+        layers = asyncio.run(run())
+        self.assertEqual(layers, list(GraphSearch(self.graph).bfs_layers(0)))
+        expected_requests = sum(-(-len(layer) // 50) for layer in layers)
+        self.assertEqual(len(service.calls), expected_requests)
+        self.assertLessEqual(service.max_in_flight, 3)
+        self.assertLessEqual(max(map(len, service.calls)), 50)
+
+        # everything reachable from 0 is cached now
+        asyncio.run(remote.find_shortest_path_bfs(0, layers[-1][-1]))
+        self.assertEqual(len(service.calls), expected_requests)
+
+    def test_budget_and_missing_nodes(self):
+        remote = AsyncGraphSearch(SlowAdjacencyService({"A": ["B"], "B": ["C"]}, latency=0))
+
+        async def run():
+            return [layer async for layer in remote.bfs_layers("A", max_nodes=2)]
+
+        self.assertEqual(asyncio.run(run()), [["A"], ["B"]])
+        self.assertIsNone(asyncio.run(remote.find_shortest_path_bfs("C", "A")))
+        self.assertEqual(remote.cache["C"], [])
+
+    def test_reused_across_event_loops(self):
+        graph = {0: list(range(1, 31)), 30: [31]}
+        remote = AsyncGraphSearch(SlowAdjacencyService(graph, latency=0.001), batch_size=5, max_in_flight=2)
+        # six batches for the second layer contend the in-flight limit
+        self.assertEqual(asyncio.run(remote.find_shortest_path_bfs(0, 31)), [0, 30, 31])
+        remote.cache.clear()
+        self.assertEqual(asyncio.run(remote.find_shortest_path_bfs(0, 31)), [0, 30, 31])
+
+
+class TestExternalBFS(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.tmp = tmp.name
+
+    def run_external(self, graph, start, run_records):
+        path = os.path.join(self.tmp, "graph.bin")
+        CSRGraph.from_dict(graph).save(path)
+        graph_search = GraphSearch(CSRGraph.load(path))
+        out = os.path.join(self.tmp, "bfs.out")
+        count = graph_search.external_bfs(start, out, run_records=run_records, work_dir=self.tmp)
+        records = list(GraphSearch.read_bfs_records(out))
+        self.assertEqual(len(records), count)
+        return graph_search.graph, records
+
+    def test_distances_and_parents_match_bfs(self):
+        rng = random.Random(12)
+        graph = {n: rng.sample(range(400), 2) for n in range(400)}
+        for run_records in (3, 50, 10 ** 6):
+            csr, records = self.run_external(graph, 0, run_records)
+            # the saved graph keeps the node ids of the in-memory CSR form
+            dist, _ = GraphSearch(graph).bfs_distances(0)
+            expected = {node: d for node, d in enumerate(dist) if d >= 0}
+            self.assertEqual({node: d for node, d, _ in records}, expected)
+            for node, d, parent in records:
+                if parent == -1:
+                    self.assertEqual((node, d), (csr.index[0], 0))
+                else:
+                    self.assertEqual(dist_of(records, parent), d - 1)
+                    self.assertIn(csr.names[node], graph[csr.names[parent]])
+            # the run files and the frontier are cleaned up
+            self.assertEqual(sorted(os.listdir(self.tmp)), ["bfs.out", "graph.bin"])
+
+    def test_merge_fan_in_bounds_open_runs(self):
+        rng = random.Random(5)
+        graph = {n: rng.sample(range(300), 3) for n in range(300)}
+        path = os.path.join(self.tmp, "graph.bin")
+        CSRGraph.from_dict(graph).save(path)
+        graph_search = GraphSearch(CSRGraph.load(path))
+        read_records = graph_search_module._read_records
+        open_now, most = [0], [0]
+
+        def counting_read_records(path, record):
+            open_now[0] += 1
+            most[0] = max(most[0], open_now[0])
+            try:
+                yield from read_records(path, record)
+            finally:
+                open_now[0] -= 1
+
+        expected = os.path.join(self.tmp, "expected.out")
+        graph_search.external_bfs(0, expected, work_dir=self.tmp)
+        out = os.path.join(self.tmp, "bfs.out")
+        with mock.patch.object(graph_search_module, "_read_records", counting_read_records):
+            graph_search.external_bfs(0, out, run_records=2, work_dir=self.tmp, fan_in=3)
+        # the merged runs plus the visited file
+        self.assertLessEqual(most[0], 4)
+        self.assertEqual(list(GraphSearch.read_bfs_records(out)), list(GraphSearch.read_bfs_records(expected)))
+        with self.assertRaises(ValueError):
+            graph_search.external_bfs(0, out, fan_in=1)
+
+    def test_named_graph(self):
+        csr, records = self.run_external(GRAPH, "A", 2)
+        named = [(csr.names[n], d, csr.names[p] if p >= 0 else None) for n, d, p in records]
+        self.assertEqual(
+            named,
+            [
+                ("A", 0, None),
+                ("B", 1, "A"),
+                ("C", 1, "A"),
+                ("D", 2, "B"),
+                ("G", 2, "C"),
+                ("E", 3, "G"),
+                ("F", 4, "E"),
+            ],
+        )
+
+
+def dist_of(records, node):
+    return next(d for n, d, _ in records if n == node)